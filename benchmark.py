@@ -0,0 +1,312 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def memory_usage_mb():
+    """
+    Return (rss, unique) memory of this process in MB from /proc (Linux only).
+
+    Unique memory counts only private pages, so weights shared with other
+    processes through the page cache are excluded.
+    """
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    usage[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return None, None
+    return usage.get("Rss"), usage.get("Private_Clean", 0) + usage.get("Private_Dirty", 0)
+
+def load_benchmark_audio(audio_path):
+    """Decode any media file to 16 kHz mono float32 audio"""
+    import whisper
+    return whisper.load_audio(audio_path)
+
+def run_isolated(function, *args):
+    """Run a benchmark function in a fresh process so peak RSS is not shared"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(function, args)
+
+def _benchmark_precision(model_size, precision, audio_path, language):
+    """Load and run one model/precision combination, returning timings and peak RSS"""
+    os.environ["WHISPER_PRECISION"] = precision
+    from core.transcriber import get_model
+
+    audio = load_benchmark_audio(audio_path)
+    start = time.perf_counter()
+    model = get_model(model_size, precision=precision)
+    load_time = time.perf_counter() - start
+
+    options = {"verbose": False, "fp16": False}
+    if language:
+        options["language"] = language
+    start = time.perf_counter()
+    result = model.transcribe(audio, **options)
+    transcribe_time = time.perf_counter() - start
+
+    return {
+        "precision": precision,
+        "load_time": load_time,
+        "transcribe_time": transcribe_time,
+        "rtf": transcribe_time / (len(audio) / 16000),
+        "peak_rss_mb": peak_rss_mb(),
+        "segments": len(result.get("segments", [])),
+    }
+
+def benchmark_precision(args):
+    """Compare float32 and int8 inference speed and memory"""
+    print(f"Benchmarking {args.model_size} precisions on {args.audio}")
+    results = [run_isolated(_benchmark_precision, args.model_size, precision, args.audio, args.language)
+               for precision in args.precisions]
+
+    print(f"{'precision':>10} {'load (s)':>10} {'decode (s)':>11} {'RTF':>7} {'peak RSS (MB)':>14} {'segments':>9}")
+    for r in results:
+        print(f"{r['precision']:>10} {r['load_time']:>10.2f} {r['transcribe_time']:>11.2f} "
+              f"{r['rtf']:>7.3f} {r['peak_rss_mb']:>14.0f} {r['segments']:>9}")
+
+def benchmark_batch(args):
+    """Measure the throughput of `transcribe_batched` versus batch size for several model sizes"""
+    import numpy as np
+    from core.audio import PcmAudio, fingerprint_wav, SAMPLE_RATE
+    from core.transcriber import get_model, detect_media_language, transcribe_batched
+
+    audio = load_benchmark_audio(args.audio)
+    # The same 16-bit samples the player extracts
+    pcm = PcmAudio((audio * 32768).clip(-32768, 32767).astype(np.int16))
+    duration = len(pcm) / SAMPLE_RATE
+    print(f"Benchmarking batched transcription on {args.audio}: {duration:.1f}s")
+
+    rows = []
+    for model_size in args.model_sizes:
+        model = get_model(model_size)
+        if not args.language:
+            # Detected once here; the timed runs are served from the detection cache
+            detect_media_language(model, pcm, fingerprint_wav(pcm))
+        # Warm up kernels so the first batch size is not penalized
+        transcribe_batched(pcm.slice(0, 30 * SAMPLE_RATE), batch_size=1, model_size=model_size,
+                           language=args.language)
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            segments = transcribe_batched(pcm, batch_size=batch_size, model_size=model_size, language=args.language)
+            elapsed = time.perf_counter() - start
+            rows.append((model_size, batch_size, elapsed, len(segments)))
+
+    print(f"{'model':>8} {'batch':>6} {'time (s)':>9} {'audio s/s':>10} {'segments':>9}")
+    for model_size, batch_size, elapsed, segments in rows:
+        print(f"{model_size:>8} {batch_size:>6} {elapsed:>9.2f} {duration / elapsed:>10.2f} {segments:>9}")
+
+def _benchmark_mmap_worker(model_size, use_mmap, barrier, results):
+    """Load a model, wait until every process has loaded it, then report memory"""
+    os.environ["WHISPER_MMAP"] = "1" if use_mmap else "0"
+    os.environ["WHISPER_PRECISION"] = "fp32"
+    from core.transcriber import get_model
+
+    start = time.perf_counter()
+    model = get_model(model_size, device="cpu")
+    load_time = time.perf_counter() - start
+    # Touch every weight so mapped pages are resident before measuring
+    for parameter in model.parameters():
+        float(parameter.sum())
+    barrier.wait()
+    rss, unique = memory_usage_mb()
+    results.put({"pid": os.getpid(), "load_time": load_time, "rss_mb": rss, "unique_mb": unique})
+    barrier.wait()
+
+def benchmark_mmap(args):
+    """Compare per-process memory of regular and memory-mapped model loading"""
+    context = multiprocessing.get_context("spawn")
+    print(f"Loading {args.model_size} in {args.processes} processes")
+    print(f"{'mode':>8} {'pid':>8} {'load (s)':>9} {'RSS (MB)':>9} {'unique (MB)':>12}")
+    for use_mmap in (False, True):
+        barrier = context.Barrier(args.processes)
+        results = context.Queue()
+        processes = [context.Process(target=_benchmark_mmap_worker,
+                                     args=(args.model_size, use_mmap, barrier, results))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        rows = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        for row in sorted(rows, key=lambda r: r["pid"]):
+            print(f"{'mmap' if use_mmap else 'regular':>8} {row['pid']:>8} {row['load_time']:>9.2f} "
+                  f"{row['rss_mb'] or 0:>9.0f} {row['unique_mb'] or 0:>12.0f}")
+
+def _gemini_translate(segments, api_key):
+    """Translate segments to English with the Gemini path, returning (segments, API calls)"""
+    from core.translator import GeminiTranslator, TranslationError
+
+    translator = GeminiTranslator(api_key)
+    outcome = {"calls": 0}
+    call_api = translator._call_api
+
+    def counting_call_api(prompt):
+        outcome["calls"] += 1
+        return call_api(prompt)
+
+    translator._call_api = counting_call_api
+    translator.translation_complete.connect(lambda translated: outcome.update(segments=translated))
+    translator.translation_error.connect(lambda message: outcome.update(error=message))
+    translator.translate_segments(segments, "english")
+    if "error" in outcome:
+        raise TranslationError(outcome["error"])
+    return outcome["segments"], outcome["calls"]
+
+def benchmark_translate(args):
+    """Compare English subtitles from Whisper's translate task with transcribe-then-Gemini"""
+    from core.transcriber import get_model
+
+    api_key = args.api_key or os.environ.get("GEMINI_API_KEY", "")
+    audio = load_benchmark_audio(args.audio)
+    duration = len(audio) / 16000
+    model = get_model(args.model_size)
+    options = {"verbose": None, "fp16": False}
+    if args.language:
+        options["language"] = args.language
+    # Warm up so neither path pays for kernel setup
+    model.transcribe(audio[:16000 * 5], **options)
+    print(f"Benchmarking English subtitles for {args.audio} ({duration:.1f}s) with the {args.model_size} model")
+
+    rows = []
+    start = time.perf_counter()
+    result = model.transcribe(audio, task="translate", **options)
+    elapsed = time.perf_counter() - start
+    rows.append(("whisper-translate", elapsed, 0.0, 0, len(result["segments"])))
+
+    start = time.perf_counter()
+    result = model.transcribe(audio, **options)
+    transcribe_time = time.perf_counter() - start
+    if api_key:
+        start = time.perf_counter()
+        segments, calls = _gemini_translate(result["segments"], api_key)
+        rows.append(("transcribe+gemini", transcribe_time, time.perf_counter() - start, calls, len(segments)))
+    else:
+        print("No Gemini API key (--api-key or GEMINI_API_KEY), timing transcription only")
+        rows.append(("transcribe", transcribe_time, 0.0, 0, len(result["segments"])))
+
+    print(f"{'path':>18} {'decode (s)':>11} {'translate (s)':>14} {'total (s)':>10} {'RTF':>7} "
+          f"{'API calls':>10} {'segments':>9}")
+    for name, decode_time, translate_time, calls, count in rows:
+        total = decode_time + translate_time
+        print(f"{name:>18} {decode_time:>11.2f} {translate_time:>14.2f} {total:>10.2f} "
+              f"{total / duration:>7.3f} {calls:>10} {count:>9}")
+
+def _benchmark_engine(engine_name, model_size, precision, audio_path, language):
+    """Load and run one engine on the audio, returning timings, peak RSS and the text"""
+    os.environ["WHISPER_ENGINE"] = engine_name
+    os.environ["WHISPER_PRECISION"] = precision
+    from core.engines import get_engine
+    from core.transcriber import get_model
+
+    engine = get_engine()
+    audio = load_benchmark_audio(audio_path)
+    start = time.perf_counter()
+    model = get_model(model_size, precision=precision)
+    load_time = time.perf_counter() - start
+
+    options = {"verbose": None, "fp16": precision == "fp16"}
+    if language:
+        options["language"] = language
+    start = time.perf_counter()
+    result = engine.transcribe(model, audio, **options)
+    transcribe_time = time.perf_counter() - start
+
+    return {
+        "engine": engine_name,
+        "precision": precision,
+        "load_time": load_time,
+        "transcribe_time": transcribe_time,
+        "rtf": transcribe_time / (len(audio) / 16000),
+        "peak_rss_mb": peak_rss_mb(),
+        "segments": len(result["segments"]),
+        "text": result["text"],
+    }
+
+def benchmark_engines(args):
+    """Compare transcription engines on identical audio"""
+    import difflib
+
+    print(f"Benchmarking engines with the {args.model_size} model on {args.audio}")
+    results = []
+    for engine_name in args.engines:
+        precision = args.precision or ("int8" if engine_name == "ctranslate2" else "fp32")
+        results.append(run_isolated(_benchmark_engine, engine_name, args.model_size, precision,
+                                    args.audio, args.language))
+
+    # Word-level agreement with the first engine's transcript
+    reference = results[0]["text"].lower().split()
+    print(f"{'engine':>12} {'precision':>10} {'load (s)':>9} {'decode (s)':>11} {'RTF':>7} "
+          f"{'peak RSS (MB)':>14} {'segments':>9} {'agreement':>10}")
+    for r in results:
+        agreement = difflib.SequenceMatcher(None, reference, r["text"].lower().split()).ratio()
+        print(f"{r['engine']:>12} {r['precision']:>10} {r['load_time']:>9.2f} {r['transcribe_time']:>11.2f} "
+              f"{r['rtf']:>7.3f} {r['peak_rss_mb']:>14.0f} {r['segments']:>9} {agreement:>10.2f}")
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Intelligent Subtitle - transcription benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    precision_parser = subparsers.add_parser("precision", help="Compare float32 and int8 CPU inference")
+    precision_parser.add_argument("audio", help="Audio or video file to transcribe")
+    precision_parser.add_argument("--model-size", default="small",
+                                  choices=["tiny", "base", "small", "medium", "large"])
+    precision_parser.add_argument("--precisions", nargs="+", default=["fp32", "int8"],
+                                  choices=["fp32", "int8"])
+    precision_parser.add_argument("--language", default=None)
+    precision_parser.set_defaults(func=benchmark_precision)
+
+    batch_parser = subparsers.add_parser("batch", help="Measure batched decoding throughput versus batch size")
+    batch_parser.add_argument("audio", help="Audio or video file to transcribe")
+    batch_parser.add_argument("--model-sizes", nargs="+", default=["tiny", "base", "small"],
+                              choices=["tiny", "base", "small", "medium", "large"])
+    batch_parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    batch_parser.add_argument("--language", default=None)
+    batch_parser.set_defaults(func=benchmark_batch)
+
+    mmap_parser = subparsers.add_parser("mmap", help="Compare per-process memory with memory-mapped weights")
+    mmap_parser.add_argument("--model-size", default="small",
+                             choices=["tiny", "base", "small", "medium", "large"])
+    mmap_parser.add_argument("--processes", type=int, default=4)
+    mmap_parser.set_defaults(func=benchmark_mmap)
+
+    engines_parser = subparsers.add_parser("engines", help="Compare transcription engines on the same audio")
+    engines_parser.add_argument("audio", help="Audio or video file to transcribe")
+    engines_parser.add_argument("--model-size", default="small",
+                                choices=["tiny", "base", "small", "medium", "large"])
+    engines_parser.add_argument("--engines", nargs="+", default=["whisper", "ctranslate2"],
+                                choices=["whisper", "ctranslate2"])
+    engines_parser.add_argument("--precision", default=None, choices=["fp32", "fp16", "int8"],
+                                help="Precision for every engine (default: fp32 for whisper, int8 for ctranslate2)")
+    engines_parser.add_argument("--language", default=None)
+    engines_parser.set_defaults(func=benchmark_engines)
+
+    translate_parser = subparsers.add_parser("translate",
+                                             help="Compare Whisper's translate task with transcribe-then-Gemini")
+    translate_parser.add_argument("audio", help="Audio or video file in a non-English language")
+    translate_parser.add_argument("--model-size", default="small",
+                                  choices=["tiny", "base", "small", "medium", "large"])
+    translate_parser.add_argument("--language", default=None, help="Source language code")
+    translate_parser.add_argument("--api-key", default=None, help="Gemini API key, defaults to GEMINI_API_KEY")
+    translate_parser.set_defaults(func=benchmark_translate)
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    args.func(args)
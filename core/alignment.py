@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+
+class WordAligner:
+    """
+    Word-level timestamps for individual segments, computed on demand.
+
+    Decoding a whole file with `word_timestamps=True` makes every window pay for
+    the alignment pass. Instead, the segments are decoded without word timings
+    and `words` aligns a single segment's known text against its slice of the
+    audio when it is needed, for example around the playhead. Results are cached
+    per segment, so moving back and forth never aligns a segment twice.
+    """
+
+    # Audio around the segment boundaries, which Whisper places only roughly
+    MARGIN_SECONDS = 0.5
+
+    def __init__(self, audio_path, model_size=None, language=None, max_entries=4096):
+        self.audio_path = audio_path
+        self.model_size = model_size
+        self.language = language
+        self.max_entries = max_entries
+        self._words = OrderedDict()  # segment key -> list of word dicts
+        self._lock = threading.Lock()
+        self._model = None
+
+    @staticmethod
+    def segment_key(segment):
+        """Identify a segment by its timing and text, which survive re-emitted segment lists"""
+        return (round(segment.get("start", 0.0), 2), round(segment.get("end", 0.0), 2), segment.get("text", ""))
+
+    def cached(self, segment):
+        """Return the cached word timings of `segment`, or None"""
+        with self._lock:
+            return self._words.get(self.segment_key(segment))
+
+    def _prepare(self):
+        from core.transcriber import get_model, detect_media_language
+        from core.audio import StreamingPcm, fingerprint_wav
+
+        if self._model is None:
+            self._model = get_model(self.model_size)
+            if not self.language:
+                # Hashing audio still arriving would wait for the end of the stream
+                if isinstance(self.audio_path, StreamingPcm) and not self.audio_path.complete:
+                    fingerprint = self.audio_path.known_fingerprint
+                else:
+                    fingerprint = fingerprint_wav(self.audio_path)
+                # Served from the detection cache filled by the transcription
+                self.language = detect_media_language(self._model, self.audio_path, fingerprint)
+        return self._model
+
+    def words(self, segment):
+        """
+        Return the word timings of `segment`, aligning it on a cache miss.
+
+        Returns:
+            List of dicts with `word`, `start`, `end` and `probability`, with
+            timestamps relative to the full audio
+        """
+        from core.audio import load_wav_pcm, SAMPLE_RATE
+        from core.engines import get_engine
+
+        words = self.cached(segment)
+        if words is not None:
+            return words
+
+        text = segment.get("text", "").strip()
+        start, end = segment.get("start", 0.0), segment.get("end", 0.0)
+        if not text or end <= start:
+            words = []
+        else:
+            model = self._prepare()
+            clip_start = max(0.0, start - self.MARGIN_SECONDS)
+            clip_end = min(clip_start + 30.0, end + self.MARGIN_SECONDS)
+            audio = load_wav_pcm(self.audio_path, int(clip_start * SAMPLE_RATE), int(clip_end * SAMPLE_RATE))
+            words = get_engine().align_words(model, audio, " " + text, language=self.language)
+            for word in words:
+                # Keep every word inside its segment
+                word["start"] = min(max(word["start"] + clip_start, start), end)
+                word["end"] = min(max(word["end"] + clip_start, word["start"]), end)
+
+        with self._lock:
+            self._words[self.segment_key(segment)] = words
+            while len(self._words) > self.max_entries:
+                self._words.popitem(last=False)
+        return words
@@ -0,0 +1,533 @@
+import os
+import math
+import wave
+import queue
+import hashlib
+import threading
+import numpy as np
+
+# Whisper expects 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+class PcmAudio:
+    """
+    16-bit mono PCM held in memory, usable wherever a WAV path is accepted.
+
+    The functions of this module that read a WAV file (`load_wav_pcm`,
+    `fingerprint_wav`, `iter_wav_windows`, ...) accept a `PcmAudio` in place of
+    the path. Samples stay 16-bit, half the size of Whisper's float32 audio, and
+    are converted per window as they are read.
+    """
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.fingerprint = None  # Filled in by `fingerprint_wav`
+
+    def __len__(self):
+        return len(self.samples)
+
+    def read(self, start_sample=0, end_sample=None):
+        """Return the int16 samples [start_sample, end_sample), clamped to the audio"""
+        return self.samples[max(0, start_sample):end_sample]
+
+    def slice(self, start_sample, end_sample):
+        """Return [start_sample, end_sample) without copying; pickling it only sends that range"""
+        return PcmAudio(self.read(start_sample, end_sample), self.sample_rate)
+
+class StreamingPcm(PcmAudio):
+    """
+    PCM that ffmpeg decodes in the background, readable while it is arriving.
+
+    A reader thread copies the s16le output of ffmpeg, in chunks of
+    `chunk_seconds`, into a buffer preallocated from the container's duration.
+    Reading a range waits until ffmpeg has delivered it, while anything that
+    needs the whole audio (its length, `samples`, the fingerprint) waits for the
+    end of the stream. Transcription can therefore start on the first windows
+    while the rest of the file is still being decoded.
+
+    The reader stays at most `max_ahead_seconds` (WHISPER_EXTRACT_AHEAD_SECONDS)
+    past the furthest sample requested so far, by a read or by `request`. When the consumer falls behind it
+    stops reading the pipe, which pauses ffmpeg, so the decoded audio does not
+    run ahead of the transcription without limit.
+    """
+
+    def __init__(self, media_path, sample_rate=SAMPLE_RATE, chunk_seconds=1.0, max_ahead_seconds=None):
+        import time
+        import ffmpeg
+        from core.cache import known_media_fingerprint, media_key
+
+        self.media_path = media_path
+        self.sample_rate = sample_rate
+        self.fingerprint = None
+        # A fingerprint recorded for this file by an earlier run, available before decoding ends
+        self.known_fingerprint = known_media_fingerprint(media_path)
+        try:
+            # Identifies the file for checkpoints made before the fingerprint is known
+            self.media_key = media_key(media_path)
+        except OSError:
+            self.media_key = None
+        if max_ahead_seconds is None:
+            max_ahead_seconds = float(os.environ.get("WHISPER_EXTRACT_AHEAD_SECONDS", "600"))
+        self.max_ahead = int(max_ahead_seconds * sample_rate) if max_ahead_seconds > 0 else math.inf
+        self.chunk_bytes = 2 * max(1, int(chunk_seconds * sample_rate))
+
+        try:
+            duration = float(ffmpeg.probe(media_path)["format"]["duration"])
+        except (ffmpeg.Error, KeyError, ValueError):
+            duration = 0.0
+        # One extra second absorbs rounding in the container's duration
+        self._buffer = np.empty(max(sample_rate, math.ceil((duration + 1.0) * sample_rate)), dtype='<i2')
+        self._available = 0
+        self._demand = 0
+        self._closed = False
+        self.complete = False
+        self.error = None
+        self._cond = threading.Condition()
+        self._clock = time.perf_counter
+        self.started = self._clock()
+        self.timings = {"first_audio": None, "extraction": None, "stalled": 0.0}
+
+        self._process = (
+            ffmpeg
+            .input(media_path)
+            .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=sample_rate)
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+        self._errors = b""
+        self._stderr_reader = threading.Thread(target=self._drain_stderr, name="ffmpeg-stderr", daemon=True)
+        self._stderr_reader.start()
+        self._reader = threading.Thread(target=self._read, name="ffmpeg-pcm-reader", daemon=True)
+        self._reader.start()
+
+    def _drain_stderr(self):
+        # Keeps ffmpeg from blocking on a full stderr pipe; the tail explains failures
+        for line in self._process.stderr:
+            self._errors = (self._errors + line)[-4096:]
+
+    def _read_chunk(self, view):
+        filled = 0
+        while filled < len(view):
+            read = self._process.stdout.readinto(view[filled:])
+            if not read:
+                break
+            filled += read
+        return filled
+
+    def _read(self):
+        digest = hashlib.sha256(f"{self.sample_rate}:1:2".encode('ascii'))
+        try:
+            while True:
+                with self._cond:
+                    while self._available >= self._demand + self.max_ahead and not self._closed:
+                        waited = self._clock()
+                        self._cond.wait()
+                        self.timings["stalled"] += self._clock() - waited
+                    if self._closed:
+                        return
+                    if 2 * self._available + self.chunk_bytes > self._buffer.nbytes:
+                        # The duration was missing or short: grow by half
+                        self._buffer = np.concatenate([self._buffer[:self._available],
+                                                       np.empty(len(self._buffer) // 2 + self.chunk_bytes,
+                                                                dtype='<i2')])
+                    offset = 2 * self._available
+                    view = memoryview(self._buffer).cast('B')[offset:offset + self.chunk_bytes]
+                # Only the reader writes past `_available`, so the copy runs unlocked
+                filled = self._read_chunk(view) // 2 * 2
+                digest.update(view[:filled])
+                with self._cond:
+                    self._available += filled // 2
+                    if filled and self.timings["first_audio"] is None:
+                        self.timings["first_audio"] = self._clock() - self.started
+                    self._cond.notify_all()
+                if filled < len(view):
+                    break
+        except Exception as e:
+            with self._cond:
+                self.error = e
+        finally:
+            self._process.stdout.close()
+            returncode = self._process.wait()
+            self._stderr_reader.join()
+            self._process.stderr.close()
+            with self._cond:
+                if returncode != 0 and self.error is None and not self._closed:
+                    self.error = RuntimeError(f"ffmpeg failed to decode {self.media_path}: "
+                                              f"{self._errors.decode('utf-8', 'replace').strip()}")
+                if self.error is None and not self._closed:
+                    self.fingerprint = digest.hexdigest()
+                self.timings["extraction"] = self._clock() - self.started
+                self.complete = True
+                self._cond.notify_all()
+            if self.fingerprint:
+                from core.cache import remember_media_fingerprint
+                remember_media_fingerprint(self.media_path, self.fingerprint)
+
+    def request(self, end_sample):
+        """
+        Let the reader decode up to `end_sample` without waiting for it.
+
+        Raises the point back-pressure is measured from, for example to the
+        playhead after a seek; `math.inf` lets ffmpeg run to the end of the file.
+        """
+        with self._cond:
+            if end_sample > self._demand:
+                self._demand = end_sample
+                self._cond.notify_all()
+
+    def wait_for(self, end_sample):
+        """
+        Block until samples up to `end_sample` are decoded, or the stream ends.
+
+        Returns:
+            Number of samples decoded so far
+        """
+        self.request(end_sample)
+        with self._cond:
+            while self._available < end_sample and not self.complete:
+                self._cond.wait()
+            if self.error is not None:
+                raise self.error
+            if self._closed:
+                raise RuntimeError("Audio extraction was stopped")
+            return self._available
+
+    def wait(self):
+        """Block until the whole stream is decoded and return its length in samples"""
+        return self.wait_for(math.inf)
+
+    @property
+    def available(self):
+        """Number of samples decoded so far"""
+        with self._cond:
+            return self._available
+
+    @property
+    def samples(self):
+        length = self.wait()
+        with self._cond:
+            return self._buffer[:length].astype(np.int16, copy=False)
+
+    def __len__(self):
+        return self.wait()
+
+    def read(self, start_sample=0, end_sample=None):
+        available = self.wait_for(math.inf if end_sample is None else end_sample)
+        end_sample = available if end_sample is None else min(end_sample, available)
+        with self._cond:
+            buffer = self._buffer
+        return buffer[max(0, min(start_sample, end_sample)):end_sample].astype(np.int16, copy=False)
+
+    def close(self):
+        """Stop ffmpeg if it is still running"""
+        with self._cond:
+            if self.complete:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._process.kill()
+
+class MediaPcm(PcmAudio):
+    """
+    PCM of a media file read range by range, without holding the whole track.
+
+    Every `read` runs ffmpeg seeking to the requested range, so only those
+    samples are ever in memory. Once transcription is done, the player's word
+    timings and range re-transcription read the audio through this instead of
+    keeping the decoded track.
+    """
+
+    def __init__(self, media_path, length, fingerprint=None, sample_rate=SAMPLE_RATE):
+        self.media_path = media_path
+        self.length = length
+        self.fingerprint = fingerprint
+        self.sample_rate = sample_rate
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def samples(self):
+        return self.read()
+
+    def read(self, start_sample=0, end_sample=None):
+        import ffmpeg
+
+        end_sample = self.length if end_sample is None else min(end_sample, self.length)
+        start_sample = max(0, min(start_sample, end_sample))
+        count = end_sample - start_sample
+        if count == 0:
+            return np.zeros(0, dtype=np.int16)
+        raw, _ = (
+            ffmpeg
+            .input(self.media_path, ss=start_sample / self.sample_rate)
+            .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=self.sample_rate,
+                    t=count / self.sample_rate)
+            .global_args('-loglevel', 'error')
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        samples = np.frombuffer(raw, dtype='<i2')[:count].astype(np.int16)
+        if len(samples) < count:
+            # Rounding of the seek can leave the range a few samples short
+            samples = np.concatenate([samples, np.zeros(count - len(samples), dtype=np.int16)])
+        return samples
+
+class PcmDigest:
+    """
+    Running SHA-256 of the samples of a `PcmAudio` from its first sample.
+
+    `update` extends the hashed prefix, so a prefix that grows window by window
+    is hashed once in total rather than once per window.
+    """
+
+    def __init__(self, audio, block_samples=1 << 20):
+        self.audio = audio
+        self.block_samples = block_samples
+        self.end = 0
+        self._digest = hashlib.sha256(f"{audio.sample_rate}:1:2".encode('ascii'))
+
+    def update(self, end_sample):
+        """Hash the samples up to `end_sample`, waiting for them if they are still arriving"""
+        for start in range(self.end, end_sample, self.block_samples):
+            block = self.audio.read(start, min(start + self.block_samples, end_sample))
+            self._digest.update(block.astype('<i2', copy=False).tobytes())
+        self.end = max(self.end, end_sample)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+def get_wav_duration(audio_path):
+    """Return the duration of a WAV file (or `PcmAudio`) in seconds"""
+    if isinstance(audio_path, PcmAudio):
+        return len(audio_path) / float(audio_path.sample_rate)
+    with wave.open(audio_path, 'rb') as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+def fingerprint_wav(audio_path, block_frames=1 << 20):
+    """
+    Return a SHA-256 fingerprint of the decoded PCM in a WAV file.
+
+    Only the sample data is hashed, so the same media extracted twice gets the
+    same fingerprint regardless of where the WAV was written.
+    """
+    if isinstance(audio_path, PcmAudio):
+        # Waits for the end of a `StreamingPcm`, which hashes its samples as they arrive
+        length = len(audio_path)
+        if audio_path.fingerprint is None:
+            # Same digest as the WAV file of the same samples
+            digest = PcmDigest(audio_path, block_frames)
+            digest.update(length)
+            audio_path.fingerprint = digest.hexdigest()
+        return audio_path.fingerprint
+    digest = hashlib.sha256()
+    with wave.open(audio_path, 'rb') as wav:
+        digest.update(f"{wav.getframerate()}:{wav.getnchannels()}:{wav.getsampwidth()}".encode('ascii'))
+        while True:
+            block = wav.readframes(block_frames)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_wav_pcm(audio_path, start_sample=0, end_sample=None):
+    """
+    Read 16-bit mono PCM from a WAV file as float32 samples in [-1, 1].
+
+    Args:
+        audio_path: Path to a 16-bit mono WAV file, or a `PcmAudio`
+        start_sample: First sample to read
+        end_sample: Sample to stop at (exclusive), defaults to the end of the file
+
+    Returns:
+        1-D float32 NumPy array
+    """
+    if isinstance(audio_path, PcmAudio):
+        # Only waits for the requested range of a `StreamingPcm`
+        return audio_path.read(start_sample, end_sample).astype(np.float32) / 32768.0
+    with wave.open(audio_path, 'rb') as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"Expected 16-bit mono WAV, got {wav.getsampwidth() * 8}-bit "
+                             f"with {wav.getnchannels()} channels: {audio_path}")
+        total = wav.getnframes()
+        end_sample = total if end_sample is None else min(end_sample, total)
+        start_sample = max(0, min(start_sample, end_sample))
+        wav.setpos(start_sample)
+        raw = wav.readframes(end_sample - start_sample)
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+def frame_rms(audio, frame_length):
+    """Return the RMS energy of consecutive non-overlapping frames"""
+    num_frames = len(audio) // frame_length
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:num_frames * frame_length].reshape(num_frames, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+def find_silence_splits(audio, target_chunk_seconds=60.0, search_seconds=10.0,
+                        frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """
+    Choose cut points close to every `target_chunk_seconds` that fall on silence.
+
+    Around each target cut the quietest frame within +/- `search_seconds` is
+    chosen, so chunks never split a word unless no pause exists nearby.
+
+    Args:
+        audio: 1-D float32 audio
+        target_chunk_seconds: Desired chunk length
+        search_seconds: How far from the target cut to look for silence
+        frame_seconds: Energy frame length
+        sample_rate: Sample rate of `audio`
+
+    Returns:
+        List of (start_sample, end_sample) tuples covering the whole audio in order
+    """
+    frame_length = max(1, int(frame_seconds * sample_rate))
+    return _silence_cuts(frame_rms(audio, frame_length), len(audio), frame_length,
+                         target_chunk_seconds, search_seconds, sample_rate)
+
+def _silence_cuts(energy, total, frame_length, target_chunk_seconds, search_seconds, sample_rate):
+    target_frames = max(1, int(target_chunk_seconds * sample_rate / frame_length))
+    search_frames = max(1, int(search_seconds * sample_rate / frame_length))
+
+    cuts = [0]
+    position = 0
+    while len(energy) - position > target_frames + search_frames:
+        low = position + target_frames - search_frames
+        high = position + target_frames + search_frames
+        low = max(low, position + 1)
+        quietest = low + int(np.argmin(energy[low:high]))
+        cuts.append(quietest * frame_length)
+        position = quietest
+    cuts.append(total)
+
+    return [(cuts[i], cuts[i + 1]) for i in range(len(cuts) - 1) if cuts[i + 1] > cuts[i]]
+
+def wav_frame_rms(audio_path, frame_length, block_frames=256):
+    """
+    Return the RMS energy of consecutive frames of a WAV file, reading it in blocks.
+
+    Gives the same result as `frame_rms(load_wav_pcm(audio_path), frame_length)`
+    while holding only `block_frames` frames of audio in memory.
+    """
+    total = get_wav_duration_samples(audio_path)
+    energy = np.zeros(total // frame_length, dtype=np.float32)
+    block_samples = frame_length * block_frames
+    for start in range(0, len(energy) * frame_length, block_samples):
+        block = load_wav_pcm(audio_path, start, min(start + block_samples, len(energy) * frame_length))
+        first = start // frame_length
+        energy[first:first + len(block) // frame_length] = frame_rms(block, frame_length)
+    return energy
+
+def get_wav_duration_samples(audio_path):
+    """Return the number of samples in a WAV file (or `PcmAudio`)"""
+    if isinstance(audio_path, PcmAudio):
+        return len(audio_path)
+    with wave.open(audio_path, 'rb') as wav:
+        return wav.getnframes()
+
+def find_wav_silence_splits(audio_path, target_chunk_seconds=60.0, search_seconds=10.0,
+                            frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """
+    `find_silence_splits` for a WAV file, without loading the whole file.
+
+    Only the frame energies are kept in memory (about 130 kB per hour of audio
+    at the default frame length), so the cut points of any length of media can
+    be found in constant audio memory.
+    """
+    frame_length = max(1, int(frame_seconds * sample_rate))
+    return _silence_cuts(wav_frame_rms(audio_path, frame_length), get_wav_duration_samples(audio_path),
+                         frame_length, target_chunk_seconds, search_seconds, sample_rate)
+
+def iter_stream_silence_splits(audio, target_chunk_seconds=60.0, search_seconds=10.0,
+                               frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """
+    `find_wav_silence_splits` for a `StreamingPcm`, yielding each window as soon
+    as the audio around its end has been decoded.
+
+    The cut points are the same as those found on the complete audio, so windows
+    decoded while ffmpeg is still running line up with a later full split.
+
+    Yields:
+        (start_sample, end_sample) tuples covering the whole audio in order
+    """
+    frame_length = max(1, int(frame_seconds * sample_rate))
+    target_frames = max(1, int(target_chunk_seconds * sample_rate / frame_length))
+    search_frames = max(1, int(search_seconds * sample_rate / frame_length))
+
+    energy = np.zeros(0, dtype=np.float32)
+    position = 0
+    cut = 0
+    while True:
+        # The same condition as `_silence_cuts`, once enough frames are known
+        needed = position + target_frames + search_frames + 1
+        available = audio.wait_for(needed * frame_length)
+        frames = available // frame_length
+        if frames > len(energy):
+            block = load_wav_pcm(audio, len(energy) * frame_length, frames * frame_length)
+            energy = np.concatenate([energy, frame_rms(block, frame_length)])
+        if len(energy) - position <= target_frames + search_frames:
+            break
+        low = max(position + target_frames - search_frames, position + 1)
+        quietest = low + int(np.argmin(energy[low:position + target_frames + search_frames]))
+        yield cut, quietest * frame_length
+        cut = quietest * frame_length
+        position = quietest
+
+    total = len(audio)
+    if total > cut:
+        yield cut, total
+
+def iter_wav_windows(audio_path, windows, prefetch=2):
+    """
+    Read the given sample ranges of a WAV file in order, one array per window.
+
+    A reader thread fills a queue of at most `prefetch` windows ahead of the
+    consumer, so the next window is usually ready as soon as the current one is
+    decoded while no more than `prefetch + 1` windows are ever held in memory.
+
+    Args:
+        audio_path: Path to a 16-bit mono WAV file
+        windows: Iterable of (start_sample, end_sample) tuples
+        prefetch: Number of windows read ahead
+
+    Yields:
+        Tuple of (start_sample, end_sample, float32 audio)
+    """
+    buffer = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read():
+        try:
+            for start, end in windows:
+                if not put((start, end, load_wav_pcm(audio_path, start, end))):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(done)
+
+    reader = threading.Thread(target=read, name="wav-window-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Release the reader if the consumer stops early
+        stop.set()
+        reader.join()
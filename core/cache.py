@@ -0,0 +1,201 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+def get_cache_dir(*parts):
+    """Return (and create) a directory under the application cache root"""
+    root = os.environ.get("INTELLIGENCE_SUBTITLE_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "intelligence_subtitle"))
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def make_cache_key(*parts):
+    """Build a stable SHA-256 key from strings and JSON-serializable values"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True)
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def atomic_write_bytes(path, data):
+    """Write a file so readers never see partial content, even across processes"""
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.partial')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def trim_directory(directory, max_size_bytes, suffix):
+    """
+    Delete the least recently used files ending in `suffix` until the total size
+    of those files fits `max_size_bytes`. Readers refresh the modification time
+    of the files they use.
+    """
+    entries = []
+    total = 0
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_size_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+class TranscriptCache:
+    """
+    Persistent on-disk cache of transcription results.
+
+    Entries are JSON files named by their key. A hit refreshes the file's
+    modification time, so trimming the cache to its size budget removes the least
+    recently used entries first.
+    """
+
+    def __init__(self, directory=None, max_size_mb=None):
+        self.directory = directory or get_cache_dir("transcripts")
+        os.makedirs(self.directory, exist_ok=True)
+        if max_size_mb is None:
+            max_size_mb = float(os.environ.get("WHISPER_RESULT_CACHE_MB", "256"))
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached segments for `key`, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                segments = json.load(f)
+            os.utime(path, None)
+            return segments
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def put(self, key, segments):
+        """Store segments for `key` and trim the cache to its size budget"""
+        data = json.dumps(segments, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            atomic_write_bytes(self._path(key), data)
+            self.trim()
+
+    def trim(self):
+        """Remove least recently used entries until the cache fits its budget"""
+        trim_directory(self.directory, self.max_size_bytes, '.json')
+
+class TranscriptionCheckpoint:
+    """
+    Progress of a windowed transcription, saved after every completed window.
+
+    The checkpoint records the media fingerprint and decode settings it was made
+    with; `load` ignores it unless both match, so a stale checkpoint is never
+    resumed with different audio or options. Audio that is still being decoded
+    has no fingerprint yet; its checkpoint is keyed by the `media_key` of the
+    file instead and carries `audio_digest`, the hash of the decoded prefix, to
+    check the audio against before resuming.
+    """
+
+    def __init__(self, fingerprint, settings, directory=None):
+        self.fingerprint = fingerprint
+        self.settings = settings
+        self.directory = directory or get_cache_dir("checkpoints")
+        self.path = os.path.join(self.directory, f"{make_cache_key('checkpoint', fingerprint, settings)}.json")
+
+    def load(self):
+        """
+        Return the saved progress, or None if there is no matching checkpoint.
+
+        Returns:
+            Dict with `completed_sample`, `segments`, `prompt`, `language` and `audio_digest`
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+
+        if state.get("fingerprint") != self.fingerprint or state.get("settings") != self.settings:
+            print("Ignoring checkpoint made with different media or decode settings")
+            return None
+        return state
+
+    def save(self, completed_sample, segments, prompt=None, language=None, audio_digest=None):
+        """Record that everything before `completed_sample` has been decoded"""
+        state = {
+            "fingerprint": self.fingerprint,
+            "settings": self.settings,
+            "completed_sample": completed_sample,
+            "segments": segments,
+            "prompt": prompt,
+            "language": language,
+            "audio_digest": audio_digest,
+        }
+        atomic_write_bytes(self.path, json.dumps(state, ensure_ascii=False).encode('utf-8'))
+
+    def clear(self):
+        """Remove the checkpoint once the transcription is complete"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def media_key(media_path):
+    """Identify a media file by its path, size and modification time, without reading it"""
+    stat = os.stat(media_path)
+    return make_cache_key('media', os.path.abspath(media_path), stat.st_size, stat.st_mtime_ns)
+
+def _media_fingerprint_path(media_path):
+    return os.path.join(get_cache_dir("media"), f"{media_key(media_path)}.txt")
+
+def known_media_fingerprint(media_path):
+    """
+    Return the PCM fingerprint recorded for this media file, or None.
+
+    Lets cached results be found before the audio has been decoded again. The
+    file is identified by its path, size and modification time.
+    """
+    try:
+        with open(_media_fingerprint_path(media_path), 'r', encoding='ascii') as f:
+            return f.read().strip() or None
+    except (OSError, ValueError):
+        return None
+
+def remember_media_fingerprint(media_path, fingerprint):
+    """Record the fingerprint of the audio decoded from `media_path`"""
+    try:
+        atomic_write_bytes(_media_fingerprint_path(media_path), fingerprint.encode('ascii'))
+    except OSError as e:
+        print(f"Warning: Could not record media fingerprint: {e}")
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import platform
+
+import numpy as np
+
+from core.audio import SAMPLE_RATE
+from core.cache import get_cache_dir, atomic_write_bytes
+
+# Model sizes from least to most accurate
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+
+# Decode settings from least to most accurate (and expensive)
+DECODE_CONFIGS = [
+    {"name": "greedy", "options": {}},
+    {"name": "beam_3", "options": {"beam_size": 3, "best_of": 3}},
+    {"name": "beam_5", "options": {"beam_size": 5, "best_of": 5}},
+]
+
+def synthetic_clip(seconds=30.0, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    Generate a deterministic speech-like test clip.
+
+    Syllable-length bursts of a harmonic source with a moving formant envelope,
+    separated by short pauses and over a low noise floor, keep the decoder busy
+    roughly like speech does without shipping an audio file.
+    """
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * sample_rate), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        length = int(rng.uniform(0.12, 0.35) * sample_rate)
+        t = np.arange(length) / sample_rate
+        pitch = rng.uniform(100, 220)
+        formant = rng.uniform(500, 2500)
+        harmonics = np.arange(1, 20)
+        weights = np.exp(-((harmonics * pitch - formant) / 600.0) ** 2)
+        syllable = (weights[:, None] * np.sin(2 * np.pi * pitch * harmonics[:, None] * t)).sum(axis=0)
+        syllable *= np.hanning(length)
+        end = min(len(audio), position + length)
+        audio[position:end] = syllable[:end - position]
+        # Words are followed by short pauses, phrases by longer ones
+        position = end + int(rng.choice([0.05, 0.05, 0.1, 0.4]) * sample_rate)
+
+    audio /= max(1e-6, np.abs(audio).max()) * 2
+    audio += rng.normal(0, 0.003, len(audio)).astype(np.float32)
+    return audio.astype(np.float32)
+
+def host_id():
+    """Identify the host so calibrations from different machines are kept apart"""
+    return f"{platform.node()}-{platform.machine()}-{os.cpu_count()}cpu"
+
+def calibration_path():
+    # Engines run at very different speeds, so each gets its own measurements
+    engine = os.environ.get("WHISPER_ENGINE", "whisper")
+    name = host_id() if engine == "whisper" else f"{host_id()}-{engine}"
+    return os.path.join(get_cache_dir("calibration"), f"{name}.json")
+
+def load_calibration():
+    """Return the stored measurements for this host, or None"""
+    try:
+        with open(calibration_path(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def calibrate(model_sizes=None, clip_seconds=30.0, load_model=None):
+    """
+    Measure the real-time factor of every model size and decode setting on this host.
+
+    Args:
+        model_sizes: Model sizes to measure, defaults to tiny through medium
+        clip_seconds: Length of the synthetic clip
+        load_model: Callable(model_size) returning a loaded model
+
+    Returns:
+        Dict with the host id and a list of measurements, also saved to disk
+    """
+    from core.engines import get_engine
+
+    if load_model is None:
+        from core.transcriber import get_model as load_model
+    engine = get_engine()
+
+    model_sizes = model_sizes or MODEL_SIZES[:4]
+    clip = synthetic_clip(clip_seconds)
+    measurements = []
+    for model_size in model_sizes:
+        model = load_model(model_size)
+        # Warm-up pass so the first configuration is not charged for kernel setup
+        engine.transcribe(model, clip[:SAMPLE_RATE * 5], language="en", fp16=False, temperature=0.0)
+        for config in DECODE_CONFIGS:
+            start = time.perf_counter()
+            engine.transcribe(model, clip, language="en", fp16=False, verbose=None, **config["options"])
+            elapsed = time.perf_counter() - start
+            rtf = elapsed / clip_seconds
+            measurements.append({"model_size": model_size, "config": config["name"],
+                                 "options": config["options"], "rtf": rtf})
+            print(f"Calibrated {model_size:>6} {config['name']:>10}: RTF {rtf:.3f}")
+
+    calibration = {"host": host_id(), "engine": engine.name, "created": time.time(), "measurements": measurements}
+    atomic_write_bytes(calibration_path(), json.dumps(calibration, indent=2).encode('utf-8'))
+    print(f"Calibration saved to {calibration_path()}")
+    return calibration
+
+def _accuracy_rank(measurement):
+    config_names = [config["name"] for config in DECODE_CONFIGS]
+    return (MODEL_SIZES.index(measurement["model_size"]), config_names.index(measurement["config"]))
+
+def choose_configuration(duration, target_rtf=None, deadline=None, calibration=None):
+    """
+    Pick the most accurate calibrated configuration that fits the time budget.
+
+    Args:
+        duration: Media duration in seconds
+        target_rtf: Maximum allowed real-time factor (processing time / duration)
+        deadline: Maximum allowed processing time in seconds
+
+    Returns:
+        The chosen measurement dict (with `model_size` and decode `options`), or
+        None when there is no calibration. When nothing fits, the fastest
+        configuration is returned.
+    """
+    calibration = calibration or load_calibration()
+    if not calibration or not calibration.get("measurements"):
+        return None
+
+    budget_rtf = float("inf")
+    if target_rtf:
+        budget_rtf = min(budget_rtf, target_rtf)
+    if deadline and duration > 0:
+        budget_rtf = min(budget_rtf, deadline / duration)
+
+    config_names = [config["name"] for config in DECODE_CONFIGS]
+    measurements = [m for m in calibration["measurements"]
+                    if m["model_size"] in MODEL_SIZES and m["config"] in config_names]
+    if not measurements:
+        return None
+    fitting = [m for m in measurements if m["rtf"] <= budget_rtf]
+    if fitting:
+        return max(fitting, key=_accuracy_rank)
+    print(f"No calibrated configuration meets RTF {budget_rtf:.3f}, using the fastest one")
+    return min(measurements, key=lambda m: m["rtf"])
@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+class DownloadError(Exception):
+    """Exception raised when a download fails or does not verify"""
+    pass
+
+def sha256_from_url(url):
+    """Return the SHA-256 embedded in a Whisper model URL, or None"""
+    match = re.search(r'/([0-9a-f]{64})/', url)
+    return match.group(1) if match else None
+
+def sha256_file(path, block_size=1 << 20):
+    """Return the hex SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def _probe(url, timeout):
+    """
+    Return (total_size, supports_ranges) for a URL.
+
+    A one-byte range request both checks for range support (206 with a
+    Content-Range header) and reports the full size.
+    """
+    request = urllib.request.Request(url, headers={"Range": "bytes=0-0"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        content_range = response.headers.get("Content-Range", "")
+        if response.status == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                return int(total), True
+        length = response.headers.get("Content-Length")
+        return (int(length) if length and length.isdigit() else None), False
+
+class ParallelDownloader:
+    """
+    Download a file with parallel HTTP range requests, resuming after interruption.
+
+    Data goes into `<dest>.partial`, preallocated to the full size, while the list
+    of completed parts is kept in `<dest>.partial.json`. A restarted download
+    only fetches the missing parts. The finished file is verified against the
+    expected SHA-256 before it is atomically renamed to its destination.
+    """
+
+    def __init__(self, url, dest_path, expected_sha256=None, connections=4,
+                 part_size=8 * 1024 * 1024, timeout=30, progress=None):
+        self.url = url
+        self.dest_path = dest_path
+        self.expected_sha256 = expected_sha256
+        self.connections = max(1, connections)
+        self.part_size = part_size
+        self.timeout = timeout
+        self.progress = progress  # callable(downloaded_bytes, total_bytes)
+        self.partial_path = dest_path + ".partial"
+        self.state_path = self.partial_path + ".json"
+        self._lock = threading.Lock()
+        self._downloaded = 0
+
+    def download(self):
+        """Download, verify and move the file into place. Returns the destination path."""
+        directory = os.path.dirname(self.dest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        total, supports_ranges = _probe(self.url, self.timeout)
+        if supports_ranges and total:
+            self._download_ranges(total)
+        else:
+            print("Server does not support range requests, downloading with a single connection")
+            self._download_stream(total)
+
+        self._verify()
+        os.replace(self.partial_path, self.dest_path)
+        self._remove(self.state_path)
+        return self.dest_path
+
+    def _load_completed(self, total):
+        """Return the set of completed part indices from a matching state file"""
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if (state.get("url") != self.url or state.get("total") != total
+                or state.get("part_size") != self.part_size
+                or not os.path.exists(self.partial_path)
+                or os.path.getsize(self.partial_path) != total):
+            return set()
+        return set(state.get("completed", []))
+
+    def _save_completed(self, total, completed):
+        state = {"url": self.url, "total": total, "part_size": self.part_size, "completed": sorted(completed)}
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def _download_ranges(self, total):
+        num_parts = (total + self.part_size - 1) // self.part_size
+        completed = self._load_completed(total)
+        if completed:
+            print(f"Resuming download: {len(completed)}/{num_parts} parts already present")
+        else:
+            with open(self.partial_path, 'wb') as f:
+                f.truncate(total)
+        self._downloaded = sum(min(self.part_size, total - index * self.part_size) for index in completed)
+
+        def fetch(index):
+            start = index * self.part_size
+            end = min(start + self.part_size, total) - 1
+            request = urllib.request.Request(self.url, headers={"Range": f"bytes={start}-{end}"})
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                if response.status != 206:
+                    raise DownloadError(f"Expected partial content for bytes {start}-{end}, got HTTP {response.status}")
+                with open(self.partial_path, 'r+b') as f:
+                    f.seek(start)
+                    position = start
+                    while True:
+                        block = response.read(1 << 16)
+                        if not block:
+                            break
+                        f.write(block)
+                        position += len(block)
+                        self._report(len(block), total)
+            if position != end + 1:
+                raise DownloadError(f"Short read for bytes {start}-{end}: got {position - start} bytes")
+            with self._lock:
+                completed.add(index)
+                self._save_completed(total, completed)
+
+        pending = [index for index in range(num_parts) if index not in completed]
+        with ThreadPoolExecutor(max_workers=self.connections) as pool:
+            for future in [pool.submit(fetch, index) for index in pending]:
+                future.result()
+
+    def _download_stream(self, total):
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response, \
+                open(self.partial_path, 'wb') as f:
+            while True:
+                block = response.read(1 << 16)
+                if not block:
+                    break
+                f.write(block)
+                self._report(len(block), total)
+
+    def _report(self, size, total):
+        with self._lock:
+            self._downloaded += size
+            downloaded = self._downloaded
+        if self.progress:
+            self.progress(downloaded, total)
+
+    def _verify(self):
+        if not self.expected_sha256:
+            return
+        actual = sha256_file(self.partial_path)
+        if actual != self.expected_sha256:
+            # A corrupt partial file cannot be resumed, start over next time
+            self._remove(self.partial_path)
+            self._remove(self.state_path)
+            raise DownloadError(f"SHA-256 mismatch for {self.url}: expected {self.expected_sha256}, got {actual}")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def download_file(url, dest_path, expected_sha256=None, connections=4, progress=None):
+    """Download `url` to `dest_path` with parallel range requests and SHA-256 verification"""
+    return ParallelDownloader(url, dest_path, expected_sha256=expected_sha256,
+                              connections=connections, progress=progress).download()
@@ -0,0 +1,255 @@
+import os
+import weakref
+import threading
+
+class TranscriptionEngine:
+    """
+    Interface of a speech-to-text backend.
+
+    An engine loads model handles and runs them. `transcribe` returns a result in
+    openai-whisper's schema: a dict with `text`, `language` and `segments`, where
+    each segment has at least `id`, `seek`, `start`, `end`, `text`, `temperature`,
+    `avg_logprob`, `compression_ratio` and `no_speech_prob`. Everything downstream
+    (the windowed decoders, `VideoPlayer.save_as_srt` and the translator) only
+    relies on that schema.
+    """
+
+    name = None
+
+    def load(self, model_size, device, precision):
+        """Load and return a model handle for `model_size`"""
+        raise NotImplementedError
+
+    def transcribe_stream(self, model, audio, **options):
+        """Yield segments as they are decoded from `audio` (a WAV path or 16 kHz float32 array)"""
+        raise NotImplementedError
+
+    def transcribe(self, model, audio, **options):
+        """Decode `audio` completely and return the whisper-style result dict"""
+        raise NotImplementedError
+
+    def detect_language(self, model, audio):
+        """Return (language code, probability) for up to 30 s of 16 kHz float32 audio"""
+        raise NotImplementedError
+
+    def align_words(self, model, audio, text, language=None):
+        """
+        Time the words of `text`, known to be spoken in `audio` (at most 30 s).
+
+        Returns:
+            List of dicts with `word`, `start`, `end` and `probability`, with times
+            relative to the start of `audio`
+        """
+        raise NotImplementedError
+
+    def unload(self, model_size=None):
+        """Drop this engine's cached models, optionally only those of `model_size`"""
+        from core.transcriber import get_model_registry
+        return get_model_registry().unload(model_size=model_size, engine=self.name)
+
+class WhisperEngine(TranscriptionEngine):
+    """The openai-whisper PyTorch implementation"""
+
+    name = "whisper"
+
+    # Whisper's defaults for attaching punctuation to the neighbouring word
+    PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+    APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+
+    def __init__(self):
+        self._locks = weakref.WeakKeyDictionary()
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, model):
+        """
+        Serialize inference on one model. Decoding installs key/value cache hooks
+        on the model's modules, which a concurrent forward pass would write into.
+        """
+        with self._locks_lock:
+            return self._locks.setdefault(model, threading.Lock())
+
+    def load(self, model_size, device, precision):
+        from core.transcriber import _load_whisper_model
+        return _load_whisper_model(model_size, device, precision)
+
+    def transcribe_stream(self, model, audio, **options):
+        # openai-whisper only returns once the whole input is decoded
+        yield from self.transcribe(model, audio, **options)["segments"]
+
+    def transcribe(self, model, audio, **options):
+        with self._lock(model):
+            return model.transcribe(audio, **options)
+
+    def detect_language(self, model, audio):
+        import whisper
+        from core.transcriber import get_precision
+
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=getattr(model.dims, "n_mels", 80))
+        mel = mel.to(model.device)
+        if get_precision() == "fp16" and model.device.type != "cpu":
+            mel = mel.half()
+        with self._lock(model):
+            _, probs = model.detect_language(mel)
+        language = max(probs, key=probs.get)
+        return language, float(probs[language])
+
+    def align_words(self, model, audio, text, language=None):
+        import torch
+        import whisper
+        from whisper.audio import N_FRAMES, HOP_LENGTH
+        from whisper.timing import find_alignment, merge_punctuations
+        from whisper.tokenizer import get_tokenizer
+
+        tokenizer_options = {"language": language, "task": "transcribe"}
+        if hasattr(model, "num_languages"):
+            tokenizer_options["num_languages"] = model.num_languages
+        tokenizer = get_tokenizer(model.is_multilingual, **tokenizer_options)
+        text_tokens = tokenizer.encode(text)
+        if not text_tokens:
+            return []
+
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=getattr(model.dims, "n_mels", 80))
+        mel = mel.to(model.device, dtype=next(model.parameters()).dtype)
+        num_frames = min(N_FRAMES, len(audio) // HOP_LENGTH)
+        with self._lock(model), torch.no_grad():
+            alignment = find_alignment(model, tokenizer, text_tokens, mel, num_frames)
+        merge_punctuations(alignment, self.PREPEND_PUNCTUATIONS, self.APPEND_PUNCTUATIONS)
+        return [{"word": timing.word, "start": round(float(timing.start), 3), "end": round(float(timing.end), 3),
+                 "probability": float(timing.probability)}
+                for timing in alignment if timing.word]
+
+class CTranslate2Model:
+    """A faster-whisper model with the information the model registry needs"""
+
+    def __init__(self, model, model_size, compute_type, memory_bytes):
+        self.model = model
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.memory_bytes = memory_bytes
+
+class CTranslate2Engine(TranscriptionEngine):
+    """
+    Whisper converted to CTranslate2, through the faster-whisper package.
+
+    The converted models are downloaded into the application cache on first use.
+    On CPU the weights run with int8 kernels when the precision is int8, which
+    is considerably faster than the PyTorch implementation.
+    """
+
+    name = "ctranslate2"
+
+    # openai-whisper transcribe() options understood by faster-whisper, with their new names
+    OPTIONS = {
+        "language": "language",
+        "task": "task",
+        "initial_prompt": "initial_prompt",
+        "beam_size": "beam_size",
+        "best_of": "best_of",
+        "patience": "patience",
+        "length_penalty": "length_penalty",
+        "temperature": "temperature",
+        "compression_ratio_threshold": "compression_ratio_threshold",
+        "logprob_threshold": "log_prob_threshold",
+        "no_speech_threshold": "no_speech_threshold",
+        "condition_on_previous_text": "condition_on_previous_text",
+        "word_timestamps": "word_timestamps",
+        "prepend_punctuations": "prepend_punctuations",
+        "append_punctuations": "append_punctuations",
+    }
+
+    COMPUTE_TYPES = {"fp32": "float32", "fp16": "float16", "int8": "int8"}
+
+    def load(self, model_size, device, precision):
+        try:
+            from faster_whisper import WhisperModel
+            from faster_whisper.utils import download_model
+        except ImportError:
+            raise RuntimeError("The ctranslate2 engine requires faster-whisper: pip install faster-whisper")
+        import torch
+        from core.cache import get_cache_dir
+
+        compute_type = self.COMPUTE_TYPES.get(precision, "int8")
+        if compute_type == "float16" and device == "cpu":
+            compute_type = "int8"
+        model_path = download_model(model_size, cache_dir=get_cache_dir("ctranslate2"))
+        # Share the thread budget set for this process (see _parallel_worker_init)
+        model = WhisperModel(model_path, device=device, compute_type=compute_type,
+                             cpu_threads=torch.get_num_threads())
+
+        # The converted weights are stored as float16; int8 halves them again in memory
+        weights_path = os.path.join(model_path, "model.bin")
+        memory_bytes = os.path.getsize(weights_path) if os.path.exists(weights_path) else 0
+        if compute_type == "int8":
+            memory_bytes //= 2
+        print(f"Loaded CTranslate2 model {model_size} ({compute_type} on {device})")
+        return CTranslate2Model(model, model_size, compute_type, memory_bytes)
+
+    def _options(self, options):
+        return {self.OPTIONS[key]: value for key, value in options.items()
+                if key in self.OPTIONS and value is not None}
+
+    @staticmethod
+    def _segment(segment):
+        result = {
+            "id": segment.id,
+            "seek": segment.seek,
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text,
+            "tokens": list(segment.tokens),
+            "temperature": segment.temperature,
+            "avg_logprob": segment.avg_logprob,
+            "compression_ratio": segment.compression_ratio,
+            "no_speech_prob": segment.no_speech_prob,
+        }
+        if segment.words:
+            result["words"] = [{"word": word.word, "start": word.start, "end": word.end,
+                                "probability": word.probability} for word in segment.words]
+        return result
+
+    def _run(self, model, audio, options):
+        # faster-whisper decodes lazily, as the returned generator is consumed
+        segments, info = model.model.transcribe(audio, **self._options(options))
+        return (self._segment(segment) for segment in segments), info
+
+    def transcribe_stream(self, model, audio, **options):
+        segments, _ = self._run(model, audio, options)
+        yield from segments
+
+    def transcribe(self, model, audio, **options):
+        segments, info = self._run(model, audio, options)
+        segments = list(segments)
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language,
+        }
+
+    def align_words(self, model, audio, text, language=None):
+        # faster-whisper has no forced alignment; re-decode the clip with word
+        # timestamps, prompted with the known text so the same words come out
+        segments, _ = model.model.transcribe(audio, language=language, initial_prompt=text,
+                                             word_timestamps=True, condition_on_previous_text=False)
+        return [{"word": word.word, "start": round(word.start, 3), "end": round(word.end, 3),
+                 "probability": word.probability}
+                for segment in segments for word in (segment.words or [])]
+
+    def detect_language(self, model, audio):
+        # Language detection runs eagerly in transcribe(); the segments are never decoded
+        _, info = model.model.transcribe(audio)
+        return info.language, float(info.language_probability)
+
+ENGINES = {engine.name: engine for engine in (WhisperEngine, CTranslate2Engine)}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(name=None):
+    """Return the engine named `name`, defaulting to WHISPER_ENGINE or "whisper" """
+    name = name or os.environ.get("WHISPER_ENGINE", "whisper")
+    if name not in ENGINES:
+        raise ValueError(f"Unknown transcription engine: {name} (choose from {', '.join(ENGINES)})")
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = ENGINES[name]()
+        return _engines[name]
@@ -0,0 +1,251 @@
+import os
+import threading
+import importlib
+from contextlib import contextmanager
+
+import numpy as np
+import whisper
+
+# Sources of precomputed log-mel spectrograms, keyed by audio file path or by
+# id() of an audio array: key -> (audio, provider). A provider is called with
+# (n_mels, padding) and returns a mel tensor or None to compute it normally.
+_sources = {}
+_lock = threading.Lock()
+_original_log_mel_spectrogram = None
+
+def _source_key(audio):
+    return ("path", audio) if isinstance(audio, str) else ("array", id(audio))
+
+def _log_mel_spectrogram(audio, n_mels=80, padding=0, device=None):
+    """Drop-in for whisper's log_mel_spectrogram that serves registered features"""
+    with _lock:
+        entry = _sources.get(_source_key(audio))
+    if entry is not None and (isinstance(audio, str) or entry[0] is audio):
+        mel = entry[1](n_mels, padding)
+        if mel is not None:
+            return mel.to(device) if device is not None else mel
+    return _original_log_mel_spectrogram(audio, n_mels, padding=padding, device=device)
+
+def install_feature_hook():
+    """Route whisper.transcribe's spectrogram computation through the registered sources"""
+    global _original_log_mel_spectrogram
+    with _lock:
+        if _original_log_mel_spectrogram is not None:
+            return
+        transcribe_module = importlib.import_module("whisper.transcribe")
+        _original_log_mel_spectrogram = transcribe_module.log_mel_spectrogram
+        transcribe_module.log_mel_spectrogram = _log_mel_spectrogram
+
+@contextmanager
+def mel_sources(sources):
+    """
+    Register (audio, provider) pairs for the duration of the block.
+
+    `audio` is either an audio file path or the exact array object that will be
+    passed to `model.transcribe`. Whisper is only patched once there is
+    something to serve.
+    """
+    sources = list(sources)
+    if not sources:
+        yield
+        return
+    install_feature_hook()
+    keys = []
+    with _lock:
+        for audio, provider in sources:
+            key = _source_key(audio)
+            _sources[key] = (audio, provider)
+            keys.append(key)
+    try:
+        yield
+    finally:
+        with _lock:
+            for key in keys:
+                _sources.pop(key, None)
+
+def is_mel_cache_enabled():
+    """Whether log-mel features are cached on disk (WHISPER_MEL_CACHE, on by default)"""
+    return os.environ.get("WHISPER_MEL_CACHE", "1").lower() not in ("0", "false", "no")
+
+class MelCache:
+    """
+    On-disk log-mel spectrogram of one audio file, per mel-bin count.
+
+    The spectrogram is computed once over the whole file, exactly as
+    `whisper.transcribe` would (with its trailing 30 s of padding), and stored as
+    a float16 .npy file named by the audio fingerprint. Later runs memory-map it
+    instead of decoding the audio and running the STFT again, whatever the model.
+    It is computed in blocks of `BLOCK_FRAMES` frames straight into the memory-mapped
+    file, so memory use does not grow with the length of the audio. With
+    `compute=False` only a spectrogram already on disk is served; the providers
+    return None otherwise, for audio that cannot be read whole yet.
+    """
+
+    BLOCK_FRAMES = 12000  # two minutes of frames per STFT
+
+    def __init__(self, audio_path, fingerprint, directory=None, max_size_mb=None, compute=True):
+        from core.cache import get_cache_dir
+
+        self.audio_path = audio_path
+        self.fingerprint = fingerprint
+        self.compute = compute
+        self.directory = directory or get_cache_dir("mel")
+        if max_size_mb is None:
+            max_size_mb = float(os.environ.get("WHISPER_MEL_CACHE_MB", "1024"))
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def _path(self, n_mels):
+        return os.path.join(self.directory, f"{self.fingerprint}-{n_mels}.npy")
+
+    def array(self, n_mels):
+        """Return the memory-mapped float16 spectrogram, computing it on first use if allowed"""
+        with self._lock:
+            if n_mels in self._arrays:
+                return self._arrays[n_mels]
+
+            path = self._path(n_mels)
+            if os.path.exists(path):
+                try:
+                    mel = np.load(path, mmap_mode='r')
+                    os.utime(path, None)
+                    print(f"Using cached log-mel features ({n_mels} bins)")
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Ignoring unreadable mel cache {path}: {e}")
+                    mel = None
+            else:
+                mel = None
+
+            if mel is None:
+                if not self.compute:
+                    return None
+                mel = self._compute(n_mels, path)
+            self._arrays[n_mels] = mel
+            return mel
+
+    def _padded_samples(self, total, padding, start, end):
+        """
+        Samples [start, end) of the signal whisper's STFT frames: the audio followed
+        by `padding` zeros, reflect-padded by half an FFT window on both sides.
+        """
+        from whisper.audio import N_FFT
+        from core.audio import load_wav_pcm
+
+        length = total + padding
+        index = np.arange(start, end, dtype=np.int64) - N_FFT // 2
+        index = np.abs(index)
+        index = np.where(index > length - 1, 2 * (length - 1) - index, index)
+        samples = np.zeros(len(index), dtype=np.float32)
+        in_audio = index < total
+        if in_audio.any():
+            low, high = int(index[in_audio].min()), int(index[in_audio].max()) + 1
+            audio = load_wav_pcm(self.audio_path, low, high)
+            samples[in_audio] = audio[index[in_audio] - low]
+        return samples
+
+    def _log_mel_blocks(self, n_mels, padding):
+        """Yield (first_frame, log10 mel power) blocks of the whole padded file"""
+        import torch
+        from whisper.audio import N_FFT, HOP_LENGTH, mel_filters
+        from core.audio import get_wav_duration_samples
+
+        total = get_wav_duration_samples(self.audio_path)
+        num_frames = (total + padding) // HOP_LENGTH
+        window = torch.hann_window(N_FFT)
+        filters = mel_filters("cpu", n_mels)
+        for first in range(0, num_frames, self.BLOCK_FRAMES):
+            last = min(first + self.BLOCK_FRAMES, num_frames)
+            samples = self._padded_samples(total, padding, first * HOP_LENGTH, (last - 1) * HOP_LENGTH + N_FFT)
+            stft = torch.stft(torch.from_numpy(samples), N_FFT, HOP_LENGTH, window=window,
+                              center=False, return_complex=True)
+            magnitudes = stft.abs() ** 2
+            yield first, torch.clamp(filters @ magnitudes, min=1e-10).log10().numpy()
+
+    def _compute(self, n_mels, path):
+        from whisper.audio import N_SAMPLES, HOP_LENGTH
+        from core.audio import get_wav_duration_samples
+        from core.cache import trim_directory
+
+        num_frames = (get_wav_duration_samples(self.audio_path) + N_SAMPLES) // HOP_LENGTH
+        temp_path = f"{path}.{os.getpid()}.partial.npy"
+        try:
+            mel = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float16, shape=(n_mels, num_frames))
+            # Whisper clamps to 8 below the global maximum and then scales by
+            # (x + 4) / 4. Blocks are stored scaled, so only the clamp is left
+            # once the maximum of the whole file is known.
+            peak = -np.inf
+            for first, log_spec in self._log_mel_blocks(n_mels, N_SAMPLES):
+                peak = max(peak, float(log_spec.max()))
+                mel[:, first:first + log_spec.shape[1]] = (log_spec + 4.0) / 4.0
+            floor = np.float16((peak - 8.0 + 4.0) / 4.0)
+            for first in range(0, num_frames, self.BLOCK_FRAMES):
+                block = mel[:, first:first + self.BLOCK_FRAMES]
+                np.maximum(block, floor, out=block)
+            mel.flush()
+            del mel
+            os.replace(temp_path, path)
+            trim_directory(self.directory, self.max_size_bytes, '.npy')
+            return np.load(path, mmap_mode='r')
+        except OSError as e:
+            print(f"Warning: Could not cache log-mel features: {e}")
+            from core.audio import load_wav_pcm
+            audio = load_wav_pcm(self.audio_path)
+            return whisper.log_mel_spectrogram(audio, n_mels, padding=N_SAMPLES).numpy().astype(np.float16)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def full(self, n_mels, padding):
+        """Provider for the whole file, matching whisper.transcribe's padded call"""
+        from whisper.audio import N_SAMPLES
+        import torch
+
+        if padding != N_SAMPLES:
+            return None
+        mel = self.array(n_mels)
+        if mel is None:
+            return None
+        return torch.from_numpy(np.asarray(mel, dtype=np.float32))
+
+    def window(self, start_sample, end_sample):
+        """
+        Provider for one window of the file.
+
+        Returns the window's frames of the whole-file spectrogram followed by 30 s
+        of the padding value, which is what Whisper itself decodes when it walks
+        a long file.
+        """
+        from whisper.audio import N_SAMPLES, N_FRAMES, HOP_LENGTH
+        import torch
+
+        def provider(n_mels, padding):
+            if padding != N_SAMPLES:
+                return None
+            mel = self.array(n_mels)
+            if mel is None:
+                return None
+            start_frame = start_sample // HOP_LENGTH
+            end_frame = min(end_sample // HOP_LENGTH, mel.shape[-1] - N_FRAMES)
+            frames = np.asarray(mel[:, start_frame:end_frame], dtype=np.float32)
+            # The trailing padding of the whole-file spectrogram is silence at the floor value
+            pad = np.asarray(mel[:, -N_FRAMES:], dtype=np.float32)
+            return torch.from_numpy(np.concatenate([frames, pad], axis=1))
+        return provider
+
+@contextmanager
+def cached_mel(audio_path, fingerprint, windows=()):
+    """
+    Serve log-mel features from the on-disk cache inside the block.
+
+    Args:
+        audio_path: Audio file path, served whole when passed to `model.transcribe`
+        fingerprint: Fingerprint of the audio, used to name the cache file
+        windows: (start_sample, end_sample, array) triples for windowed decoding;
+            passing exactly `array` to `model.transcribe` serves that slice
+    """
+    cache = MelCache(audio_path, fingerprint)
+    sources = [(audio_path, cache.full)]
+    sources.extend((array, cache.window(start, end)) for start, end, array in windows)
+    with mel_sources(sources):
+        yield cache
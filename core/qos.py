@@ -0,0 +1,174 @@
+import os
+import threading
+
+def available_cpus():
+    """Return the CPU ids this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+class ResourceGovernor:
+    """
+    Divides the CPU between transcription and playback.
+
+    By default torch starts one thread per core, so decoding Whisper windows
+    competes with VLC's video decoder and the Qt event loop for every core and
+    playback drops frames. The governor keeps some cores for playback while the
+    video is playing (WHISPER_PLAYBACK_CORES) and a single one for the UI while
+    it is paused, and gives transcription the rest.
+
+    Thread counts are per thread in torch's OpenMP backend, so the player only
+    records the playback state with `set_playing` and each decoding thread picks
+    up the current allocation through `apply` before its next window. Worker
+    processes of `--workers` runs are additionally pinned to the transcription
+    cores and reniced (WHISPER_NICE), and re-pinned whenever the state changes.
+    """
+
+    def __init__(self, playback_cores=None, niceness=None, threads=None):
+        self.cpus = available_cpus()
+        # Fixed torch thread count of a pool process given its share by the parent
+        self.threads = threads
+        total = len(self.cpus)
+        if playback_cores is None:
+            playback_cores = int(os.environ.get("WHISPER_PLAYBACK_CORES", "0") or 0) or (2 if total >= 4 else 1)
+        self.playback_cores = max(0, min(playback_cores, total - 1))
+        self.idle_cores = min(1, total - 1)  # The Qt event loop while paused
+        self.niceness = int(os.environ.get("WHISPER_NICE", "10")) if niceness is None else niceness
+        self.playing = False
+        self._generation = 0
+        self._applied = threading.local()
+        self._pids = set()
+        self._lock = threading.Lock()
+        self._frames = {"displayed": 0, "lost": 0}
+        self._frames_at_change = dict(self._frames)
+
+    def transcription_cpus(self):
+        """CPU ids left to transcription in the current playback state"""
+        reserve = self.playback_cores if self.playing else self.idle_cores
+        return self.cpus[:len(self.cpus) - reserve]
+
+    def set_playing(self, playing):
+        """Record whether the video is playing, reallocating the cores on a change"""
+        if playing == self.playing:
+            return
+        previous = self.allocation()
+        with self._lock:
+            self.playing = playing
+            self._generation += 1
+            self._frames_at_change = dict(self._frames)
+            cpus = self.transcription_cpus()
+            pids = list(self._pids)
+        if previous["state"] == "playing":
+            print(f"CPU governor: {previous['frames_lost']} of "
+                  f"{previous['frames_lost'] + previous['frames_displayed']} frames dropped "
+                  f"with {previous['torch_threads']} transcription threads")
+        print(f"CPU governor: {'playing' if playing else 'paused'}, "
+              f"{len(cpus)} of {len(self.cpus)} cores for transcription")
+        for pid in pids:
+            self._pin(pid, cpus)
+
+    def apply(self):
+        """Set the calling thread's torch thread count to the current allocation"""
+        with self._lock:
+            generation = self._generation
+            threads = self.threads or len(self.transcription_cpus())
+        if getattr(self._applied, "generation", None) == generation:
+            return
+        self._applied.generation = generation
+        try:
+            import torch
+        except ImportError:
+            return
+        torch.set_num_threads(threads)
+        try:
+            # Whisper has no inter-op parallelism worth a core of its own
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Only allowed before the first inter-op parallel work
+
+    def track_processes(self, pids):
+        """Pin worker processes to the transcription cores until `release_processes`"""
+        with self._lock:
+            pids = [pid for pid in pids if pid not in self._pids]
+            self._pids.update(pids)
+            cpus = self.transcription_cpus()
+        for pid in pids:
+            self._pin(pid, cpus)
+
+    def release_processes(self):
+        with self._lock:
+            self._pids.clear()
+
+    def _pin(self, pid, cpus):
+        if not hasattr(os, "sched_setaffinity"):
+            return
+        try:
+            os.sched_setaffinity(pid, cpus)
+        except (ProcessLookupError, PermissionError, OSError) as e:
+            print(f"Warning: Could not set CPU affinity of process {pid}: {e}")
+
+    def process_settings(self, workers):
+        """
+        Settings for the initializer of `workers` transcription processes.
+
+        Returns:
+            Tuple of (torch threads per process, CPU ids, niceness)
+        """
+        with self._lock:
+            cpus = self.transcription_cpus()
+        return max(1, len(cpus) // workers), cpus, self.niceness
+
+    def record_frames(self, displayed, lost):
+        """Record VLC's cumulative displayed and lost picture counts"""
+        with self._lock:
+            if displayed < self._frames["displayed"] or lost < self._frames["lost"]:
+                # Counters restart with every new media
+                self._frames_at_change = {"displayed": 0, "lost": 0}
+            self._frames = {"displayed": displayed, "lost": lost}
+
+    def allocation(self):
+        """
+        Return the current allocation and the frames dropped under it.
+
+        `frames_lost` and `frames_displayed` count since the last change of the
+        playback state, so the drop rate of each allocation can be compared.
+        """
+        with self._lock:
+            cpus = self.transcription_cpus()
+            lost = self._frames["lost"] - self._frames_at_change["lost"]
+            displayed = self._frames["displayed"] - self._frames_at_change["displayed"]
+            return {
+                "state": "playing" if self.playing else "paused",
+                "cores": len(self.cpus),
+                "transcription_cpus": cpus,
+                "torch_threads": len(cpus),
+                "reserved_cores": len(self.cpus) - len(cpus),
+                "niceness": self.niceness,
+                "worker_processes": len(self._pids),
+                "frames_displayed": displayed,
+                "frames_lost": lost,
+                "drop_rate": lost / max(1, lost + displayed),
+            }
+
+_governor = None
+_governor_lock = threading.Lock()
+
+def get_governor():
+    """Return the process-wide resource governor"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ResourceGovernor()
+        return _governor
+
+def set_process_threads(threads):
+    """
+    Give this process a governor with a fixed torch thread count.
+
+    Used in `--workers` pool processes, whose parent splits the transcription
+    cores between them and re-pins them when the playback state changes.
+    """
+    global _governor
+    with _governor_lock:
+        _governor = ResourceGovernor(threads=threads)
+        return _governor
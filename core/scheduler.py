@@ -0,0 +1,43 @@
+import threading
+
+class PlayheadScheduler:
+    """
+    Chooses which transcription window to decode next from the playback position.
+
+    The player reports its position with `set_playhead`, from any thread. The
+    window under the playhead is decoded first, then the windows after it in
+    order; the windows before it are only decoded once everything ahead is done.
+    Every seek therefore re-prioritizes the remaining work, while normal playback
+    never overtakes the decoder in a region it has not reached yet.
+    """
+
+    def __init__(self, playhead=0.0):
+        self._playhead = playhead
+        self._lock = threading.Lock()
+        self.seeks = 0
+
+    def set_playhead(self, seconds, seek=False):
+        """Record the playback position in seconds, `seek` marking a jump"""
+        with self._lock:
+            self._playhead = max(0.0, seconds)
+            if seek:
+                self.seeks += 1
+
+    @property
+    def playhead(self):
+        with self._lock:
+            return self._playhead
+
+    def next_window(self, pending):
+        """
+        Pick the next window to decode.
+
+        Args:
+            pending: Non-empty list of (index, start_seconds, end_seconds) tuples
+
+        Returns:
+            Index of the window to decode next
+        """
+        playhead = self.playhead
+        ahead = [window for window in pending if window[2] > playhead]
+        return min(ahead or pending, key=lambda window: window[1])[0]
@@ -1,8 +1,11 @@
 import os
 import sys
 import ssl
-import urllib.request
+import time
+import threading
 import warnings
+from contextlib import closing
+from collections import OrderedDict
 
 # Check if we have the correct whisper package
 try:
@@ -38,8 +41,13 @@ def is_model_downloaded(model_name="tiny"):
     model_path = os.path.join(whisper_cache_dir, f"{model_name}.pt")
     return os.path.exists(model_path)
 
-def download_model_manually(model_name="tiny"):
-    """Download the model manually with SSL verification disabled"""
+def download_model_manually(model_name="tiny", connections=None):
+    """
+    Download the model with parallel range requests, resuming a previous partial
+    download and verifying the SHA-256 embedded in the model URL.
+    """
+    from core.downloader import download_file, sha256_from_url
+    
     try:
         print(f"Manually downloading whisper {model_name} model...")
         
@@ -61,47 +69,693 @@ def download_model_manually(model_name="tiny"):
         if not model_url:
             print(f"No manual URL for {model_name} model. Using whisper's downloader.")
             return False
-            
-        # Create an SSL context that doesn't verify certificates
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
+        
+        if connections is None:
+            connections = int(os.environ.get("WHISPER_DOWNLOAD_CONNECTIONS", "8"))
         
         # Download the model with progress indicator
         model_path = os.path.join(whisper_cache_dir, f"{model_name}.pt")
+        last_reported = [-1]
         
-        def report_progress(block_num, block_size, total_size):
+        def report_progress(downloaded, total_size):
             """Report download progress"""
-            if total_size > 0:
-                percent = block_num * block_size * 100 / total_size
+            if total_size:
+                percent = downloaded * 100 / total_size
                 # Only report progress every 2%
-                if int(percent) % 2 == 0:
-                    mb_downloaded = block_num * block_size / (1024 * 1024)
+                if int(percent) // 2 != last_reported[0]:
+                    last_reported[0] = int(percent) // 2
+                    mb_downloaded = downloaded / (1024 * 1024)
                     mb_total = total_size / (1024 * 1024)
                     print(f"\rDownloading model: {percent:.1f}% ({mb_downloaded:.1f} MB / {mb_total:.1f} MB)", end="", flush=True)
         
-        print(f"Starting download of {model_name} model...")
-        urllib.request.urlretrieve(model_url, model_path, reporthook=report_progress)
-        print("\nModel downloaded successfully!")
+        print(f"Starting download of {model_name} model ({connections} connections)...")
+        download_file(model_url, model_path, expected_sha256=sha256_from_url(model_url),
+                      connections=connections, progress=report_progress)
+        print("\nModel downloaded and verified successfully!")
         
-        # Verify the download was successful
-        if os.path.exists(model_path):
-            model_size_mb = os.path.getsize(model_path) / (1024 * 1024)
-            print(f"Model downloaded to {model_path} ({model_size_mb:.1f} MB)")
-            return True
-        else:
-            print(f"Failed to download model to {model_path}")
-            return False
+        model_size_mb = os.path.getsize(model_path) / (1024 * 1024)
+        print(f"Model downloaded to {model_path} ({model_size_mb:.1f} MB)")
+        return True
     except Exception as e:
-        print(f"Manual download failed: {e}")
+        print(f"\nManual download failed: {e}")
         return False
 
-def transcribe(audio_path):
+def get_default_device():
+    """Return the torch device Whisper models should be loaded on"""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "cuda"
+    except ImportError:
+        pass
+    return "cpu"
+
+def estimate_model_bytes(model):
+    """Estimate the memory held by a loaded model's parameters and buffers"""
+    if hasattr(model, "memory_bytes"):
+        # Engines without torch modules report their own estimate
+        return model.memory_bytes
+    total = 0
+    try:
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    except Exception:
+        pass
+    return total
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded Whisper models.
+    
+    Models are keyed by (size, device, precision, engine) and kept in least-recently-used
+    order. When the estimated memory of the cached models exceeds the budget, the
+    least recently used models are evicted until the budget is met again. The most
+    recently requested model is always kept, even if it alone exceeds the budget.
+    """
+    
+    def __init__(self, memory_budget_mb=None):
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.environ.get("WHISPER_MODEL_MEMORY_MB", "4096"))
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self._models = OrderedDict()  # key -> (model, size_bytes)
+        self._loading = {}            # key -> threading.Event set when the load finishes
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time_total = 0.0
+        self.last_load_time = 0.0
+        
+    def get(self, model_size, device=None, precision="fp32", loader=None, engine="whisper"):
+        """
+        Return a loaded model, loading it on a cache miss.
+        
+        Args:
+            model_size: Whisper model size name (tiny, base, small, ...)
+            device: Torch device, defaults to CUDA when available
+            precision: Weight precision label ("fp32", "fp16", ...)
+            loader: Optional callable(model_size, device, precision) used on a miss
+            engine: Name of the transcription engine the model belongs to
+            
+        Returns:
+            The loaded Whisper model
+        """
+        device = device or get_default_device()
+        key = (model_size, device, precision, engine)
+        
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    print(f"Model registry hit: {key}")
+                    return self._models[key][0]
+                
+                in_flight = self._loading.get(key)
+                if in_flight is None:
+                    # This caller performs the load; others wait on the event
+                    in_flight = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            
+            print(f"Model {key} is already loading, waiting...")
+            in_flight.wait()
+        
+        print(f"Model registry miss: {key}, loading...")
+        try:
+            start = time.perf_counter()
+            model = (loader or _load_whisper_model)(model_size, device, precision)
+            load_time = time.perf_counter() - start
+            print(f"Model {key} loaded in {load_time:.2f}s")
+            
+            with self._lock:
+                self.last_load_time = load_time
+                self.load_time_total += load_time
+                self._models[key] = (model, estimate_model_bytes(model))
+                self._evict()
+            return model
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            in_flight.set()
+    
+    def _evict(self):
+        """Evict least recently used models until the memory budget is met"""
+        while len(self._models) > 1 and self.memory_bytes() > self.memory_budget_bytes:
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            print(f"Model registry evicted {key} (memory budget {self.memory_budget_bytes / (1024 * 1024):.0f} MB)")
+        
+        try:
+            import gc
+            gc.collect()
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+    
+    def memory_bytes(self):
+        """Total estimated memory of the cached models"""
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+    
+    def unload(self, model_size=None, engine=None):
+        """Drop the cached models matching `model_size` and `engine`, returning how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._models
+                    if (model_size is None or key[0] == model_size) and (engine is None or key[3] == engine)]
+            for key in keys:
+                del self._models[key]
+        if keys:
+            self._evict()
+        return len(keys)
+    
+    def clear(self):
+        """Drop every cached model"""
+        with self._lock:
+            self._models.clear()
+    
+    def stats(self):
+        """Return hit/miss, eviction and load-time counters"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_time_total": self.load_time_total,
+                "last_load_time": self.last_load_time,
+                "cached_models": list(self._models.keys()),
+                "memory_mb": self.memory_bytes() / (1024 * 1024),
+                "memory_budget_mb": self.memory_budget_bytes / (1024 * 1024),
+            }
+
+def _load_whisper_model(model_size, device, precision):
+    """Download (if needed) and load a Whisper model"""
+    # Check if we need to manually download the model
+    if not is_model_downloaded(model_size):
+        print(f"Model not found locally. Downloading {model_size} model (this may take a while)...")
+        downloaded = download_model_manually(model_size)
+        if not downloaded:
+            print("Could not manually download model, trying standard method...")
+    
+    if precision == "int8":
+        return load_quantized_model(model_size)
+    
+    if precision == "fp32" and device == "cpu" and is_mmap_enabled():
+        try:
+            return load_mmap_model(model_size)
+        except Exception as e:
+            print(f"Warning: Memory-mapped load failed ({e}), loading normally")
+    
+    model = whisper.load_model(model_size, device=device)
+    if precision == "fp16" and device != "cpu":
+        model = model.half()
+    return model
+
+def is_mmap_enabled():
+    """Whether CPU models are loaded from memory-mapped weights (WHISPER_MMAP)"""
+    return os.environ.get("WHISPER_MMAP", "0").lower() in ("1", "true", "yes")
+
+def _convert_checkpoint_for_mmap(checkpoint_path, mmap_path):
+    """Re-save a Whisper checkpoint as contiguous float32 tensors in torch's zip format"""
+    import torch
+    
+    start = time.perf_counter()
+    checkpoint = torch.load(checkpoint_path, map_location="cpu")
+    state = {
+        "dims": checkpoint["dims"],
+        "model_state_dict": {name: tensor.float().contiguous()
+                             for name, tensor in checkpoint["model_state_dict"].items()},
+    }
+    # Write beside the target and rename, so concurrent processes never map a partial file
+    temp_path = f"{mmap_path}.{os.getpid()}.partial"
+    try:
+        torch.save(state, temp_path)
+        os.replace(temp_path, mmap_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    print(f"Converted {checkpoint_path} for memory mapping in {time.perf_counter() - start:.2f}s")
+
+def load_mmap_model(model_size):
+    """
+    Load a CPU model whose weights are memory-mapped read-only from disk.
+    
+    The checkpoint is converted once into a file that torch can map directly. The
+    model is then built without allocating weights and the mapped tensors are
+    assigned in place, so every process using the model shares one copy in the
+    page cache and a warm load does not read the weights at all.
+    """
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+    from core.cache import get_cache_dir
+    
+    checkpoint_path = os.path.join(os.path.expanduser("~"), ".cache", "whisper", f"{model_size}.pt")
+    mmap_path = os.path.join(get_cache_dir("mmap"), f"{model_size}-fp32.pt")
+    if not os.path.exists(mmap_path):
+        if not os.path.exists(checkpoint_path):
+            raise FileNotFoundError(f"Model checkpoint not found: {checkpoint_path}")
+        _convert_checkpoint_for_mmap(checkpoint_path, mmap_path)
+    
+    start = time.perf_counter()
+    state = torch.load(mmap_path, map_location="cpu", mmap=True, weights_only=True)
+    dims = ModelDimensions(**state["dims"])
+    with torch.device("meta"):
+        model = Whisper(dims)
+    model.load_state_dict(state["model_state_dict"], assign=True)
+    
+    # Non-persistent buffers are not in the checkpoint and were created on the meta device
+    mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-float("inf")).triu_(1)
+    model.decoder.register_buffer("mask", mask, persistent=False)
+    alignment_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+    alignment_heads[dims.n_text_layer // 2:] = True
+    model.register_buffer("alignment_heads", alignment_heads.to_sparse(), persistent=False)
+    if model_size in getattr(whisper, "_ALIGNMENT_HEADS", {}):
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_size])
+    
+    for name, tensor in list(model.named_parameters()) + list(model.named_buffers()):
+        if tensor.is_meta:
+            raise RuntimeError(f"Tensor {name} was not restored from the mapped checkpoint")
+    
+    print(f"Memory-mapped {model_size} model in {time.perf_counter() - start:.2f}s")
+    return model.eval()
+
+def get_precision():
+    """Return the configured weight precision (WHISPER_PRECISION: fp32, fp16 or int8)"""
+    return os.environ.get("WHISPER_PRECISION", "fp32")
+
+def _replace_linear_subclasses(module):
+    """
+    Swap Whisper's nn.Linear subclass for plain nn.Linear, sharing the weights.
+    
+    Dynamic quantization only matches the exact nn.Linear type, so Whisper's
+    dtype-casting subclass would otherwise be left in float32.
+    """
+    import torch.nn as nn
+    
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+            linear = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _replace_linear_subclasses(child)
+
+def quantize_model(model):
+    """Apply dynamic int8 quantization to the linear layers of a CPU Whisper model"""
+    import torch
+    import torch.nn as nn
+    
+    model = model.cpu().float().eval()
+    _replace_linear_subclasses(model)
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def load_quantized_model(model_size):
+    """
+    Load an int8 dynamically-quantized model, converting it only once.
+    
+    The quantized module is saved under the application cache directory, so later
+    loads skip both the float32 checkpoint and the conversion.
+    """
+    import torch
+    from core.cache import get_cache_dir
+    
+    quantized_path = os.path.join(get_cache_dir("quantized"), f"{model_size}-int8-torch{torch.__version__}.pt")
+    if os.path.exists(quantized_path):
+        try:
+            model = torch.load(quantized_path, map_location="cpu", weights_only=False)
+            print(f"Loaded quantized model from {quantized_path}")
+            return model.eval()
+        except Exception as e:
+            print(f"Warning: Could not load quantized model ({e}), converting again")
+    
+    model = _load_whisper_model(model_size, "cpu", "fp32")
+    start = time.perf_counter()
+    model = quantize_model(model)
+    print(f"Quantized {model_size} model to int8 in {time.perf_counter() - start:.2f}s")
+    
+    try:
+        from core.cache import atomic_write_bytes
+        import io
+        buffer = io.BytesIO()
+        torch.save(model, buffer)
+        atomic_write_bytes(quantized_path, buffer.getvalue())
+        print(f"Saved quantized model to {quantized_path}")
+    except Exception as e:
+        print(f"Warning: Could not save quantized model: {e}")
+    return model
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+def get_model_registry():
+    """Return the process-wide model registry"""
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            _model_registry = ModelRegistry()
+        return _model_registry
+
+_preload_state = {"state": "idle", "model_size": None, "error": None}
+_preload_thread = None
+
+def preload_model(model_size=None):
+    """
+    Start loading the configured model on a background thread.
+    
+    A transcription that asks for the same model while the preload is running
+    waits for it through the model registry instead of loading a second copy.
+    
+    Returns:
+        The preload thread
+    """
+    global _preload_thread
+    model_size = model_size or os.environ.get("WHISPER_MODEL_SIZE", "small")
+    if _preload_thread is not None and _preload_thread.is_alive():
+        return _preload_thread
+    
+    def run():
+        _preload_state.update(state="loading", model_size=model_size, error=None)
+        try:
+            get_model(model_size)
+            _preload_state["state"] = "ready"
+            print(f"Preloaded Whisper model: {model_size}")
+        except Exception as e:
+            _preload_state.update(state="error", error=str(e))
+            print(f"Model preload failed: {e}")
+    
+    _preload_thread = threading.Thread(target=run, name="whisper-preload", daemon=True)
+    _preload_thread.start()
+    return _preload_thread
+
+def get_preload_state():
+    """Return the background preload state: idle, loading, ready or error"""
+    return dict(_preload_state)
+
+def get_model(model_size=None, device=None, precision=None, engine=None):
+    """Return a cached model of the configured engine from the process-wide registry"""
+    from core.engines import get_engine
+    
+    engine = get_engine(engine)
+    model_size = model_size or os.environ.get("WHISPER_MODEL_SIZE", "small")
+    precision = precision or get_precision()
+    if precision == "int8":
+        # Dynamic quantization only has CPU kernels
+        device = "cpu"
+    return get_model_registry().get(model_size, device=device, precision=precision,
+                                    loader=engine.load, engine=engine.name)
+
+def decode_settings(model_size, language, decode_options=None):
+    """Settings that change the decoded output, used to key cached results"""
+    return {
+        "engine": os.environ.get("WHISPER_ENGINE", "whisper"),
+        "model_size": model_size,
+        "language": language,
+        "vad": is_vad_enabled(),
+        "skip_non_speech": is_non_speech_skip_enabled(),
+        "precision": get_precision(),
+        "decode_options": decode_options or {},
+    }
+
+def is_whisper_translation_enabled():
+    """Whether English subtitles come from Whisper's translate task (WHISPER_TRANSLATE)"""
+    return os.environ.get("WHISPER_TRANSLATE", "0").lower() in ("1", "true", "yes")
+
+def task_for_target(target_language):
+    """
+    Return the Whisper task producing subtitles for `target_language`.
+    
+    Whisper can only translate into English, so "translate" is returned for an
+    English target when WHISPER_TRANSLATE is enabled, and "transcribe" otherwise.
+    """
+    if target_language and target_language.lower() in ("english", "en") and is_whisper_translation_enabled():
+        return "translate"
+    return "transcribe"
+
+def _with_task(decode_options, task):
+    """Add a non-default Whisper task to the decode options, keeping cache keys of plain transcriptions"""
+    if task and task != "transcribe":
+        return dict(decode_options, task=task)
+    return decode_options
+
+def select_configuration(audio_path, model_size):
+    """
+    Apply the --target-rtf / --deadline budget to choose a model and decode options.
+    
+    Uses the per-host calibration from `core.calibration`. Without a budget or a
+    calibration the configured model size and Whisper's default decoding are kept.
+    
+    Returns:
+        Tuple of (model_size, decode_options)
+    """
+    target_rtf = float(os.environ.get("WHISPER_TARGET_RTF", "0") or 0)
+    deadline = float(os.environ.get("WHISPER_DEADLINE", "0") or 0)
+    if not target_rtf and not deadline:
+        return model_size, {}
+    
+    from core.audio import get_wav_duration
+    from core.calibration import choose_configuration
+    
+    duration = get_wav_duration(audio_path)
+    choice = choose_configuration(duration, target_rtf=target_rtf or None, deadline=deadline or None)
+    if choice is None:
+        print("No calibration found for this host, run 'python main.py --calibrate' first")
+        return model_size, {}
+    
+    print(f"Selected {choice['model_size']} with {choice['config']} decoding "
+          f"(calibrated RTF {choice['rtf']:.3f}, ~{choice['rtf'] * duration:.0f}s for {duration:.0f}s of media)")
+    return choice["model_size"], dict(choice["options"])
+
+def is_result_cache_enabled():
+    """Whether cached transcription results may be reused (WHISPER_NO_CACHE bypasses)"""
+    return os.environ.get("WHISPER_NO_CACHE", "0").lower() not in ("1", "true", "yes")
+
+_transcript_cache = None
+
+def get_transcript_cache():
+    """Return the process-wide transcription result cache"""
+    global _transcript_cache
+    if _transcript_cache is None:
+        from core.cache import TranscriptCache
+        _transcript_cache = TranscriptCache()
+    return _transcript_cache
+
+def transcript_cache_key(fingerprint, model_size, language, decode_options=None):
+    """Key a transcription result by the decoded PCM fingerprint and the decode settings"""
+    from core.cache import make_cache_key
+    return make_cache_key("transcript", fingerprint, decode_settings(model_size, language, decode_options))
+
+_language_cache = {}
+
+def detect_media_language(model, audio_path, fingerprint=None, min_confidence=None):
+    """
+    Detect the spoken language of a media file once and cache it by fingerprint.
+    
+    Detection runs on the first 30 seconds starting at the first detected speech,
+    so music or silence at the start of the file does not decide the language.
+    
+    Args:
+        model: Model loaded by `get_model`
+        audio_path: 16 kHz mono WAV path, or the `PcmAudio` decoded by the worker
+        fingerprint: Media fingerprint used as the cache key
+        min_confidence: Probability below which the language is not pinned,
+            defaults to WHISPER_LANGUAGE_MIN_CONFIDENCE or 0.6
+        
+    Returns:
+        Language code to pin for all decoding, or None to let each window detect its own
+    """
+    import json
+    from core.audio import load_wav_pcm, SAMPLE_RATE
+    from core.cache import get_cache_dir, atomic_write_bytes
+    from core.engines import get_engine
+    from core.vad import detect_speech_regions
+    
+    if min_confidence is None:
+        min_confidence = float(os.environ.get("WHISPER_LANGUAGE_MIN_CONFIDENCE", "0.6"))
+    
+    cache_path = None
+    if fingerprint:
+        cache_path = os.path.join(get_cache_dir("languages"), f"{fingerprint}.json")
+        detection = _language_cache.get(fingerprint)
+        if detection is None and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    detection = json.load(f)
+            except (OSError, ValueError):
+                detection = None
+        if detection is not None:
+            _language_cache[fingerprint] = detection
+            print(f"Using cached language detection: {detection['language']} "
+                  f"(confidence {detection['confidence']:.2f})")
+            return detection["language"] if detection["confidence"] >= min_confidence else None
+    
+    start = time.perf_counter()
+    # Look for speech in the first ten minutes only, one block at a time
+    window_start = 0
+    block_samples = 30 * SAMPLE_RATE
+    for block_start in range(0, 600 * SAMPLE_RATE, block_samples):
+        block = load_wav_pcm(audio_path, block_start, block_start + block_samples)
+        regions = detect_speech_regions(block)
+        if regions:
+            window_start = block_start + regions[0][0]
+            break
+        if len(block) < block_samples:
+            break
+    window = load_wav_pcm(audio_path, window_start, window_start + 30 * SAMPLE_RATE)
+    
+    language, confidence = get_engine().detect_language(model, window)
+    detection = {"language": language, "confidence": confidence,
+                 "offset": window_start / SAMPLE_RATE}
+    print(f"Detected language {language} (confidence {detection['confidence']:.2f}) "
+          f"at {detection['offset']:.1f}s in {time.perf_counter() - start:.2f}s")
+    
+    if fingerprint:
+        _language_cache[fingerprint] = detection
+        try:
+            atomic_write_bytes(cache_path, json.dumps(detection).encode('utf-8'))
+        except OSError as e:
+            print(f"Warning: Could not cache language detection: {e}")
+    
+    if detection["confidence"] < min_confidence:
+        print("Language confidence is low, detecting per window instead")
+        return None
+    return language
+
+def is_vad_enabled():
+    """Whether the voice-activity pre-filter is enabled (WHISPER_VAD)"""
+    return os.environ.get("WHISPER_VAD", "0").lower() in ("1", "true", "yes")
+
+def is_non_speech_skip_enabled():
+    """Whether windows classified as music/noise/silence skip the decoder (WHISPER_SKIP_NON_SPEECH)"""
+    return os.environ.get("WHISPER_SKIP_NON_SPEECH", "0").lower() in ("1", "true", "yes")
+
+_decode_stats = {
+    "windows_decoded": 0,
+    "windows_skipped": {"music": 0, "noise": 0, "silence": 0},
+    "decode_passes": 0,
+    "fallback_decodes": 0,
+    "decode_passes_avoided": 0,
+    # Decoded windows in which Whisper itself found no speech, the closest
+    # measurable stand-in for the windows the classifier skips
+    "non_speech_passes": 0,
+    "non_speech_fallbacks": 0,
+}
+_decode_stats_lock = threading.Lock()
+
+# Whisper's no_speech_prob above which a decoded window counts as non-speech
+NO_SPEECH_THRESHOLD = 0.6
+
+def get_decode_stats():
+    """
+    Return counters of decoder passes run, temperature fallbacks and passes avoided.
+    
+    `fallback_decodes_avoided_estimate` is the passes avoided times the fallback
+    rate measured on decoded windows Whisper found no speech in, or on all
+    decoded windows until there are such windows. Skipped windows are never
+    decoded, so their own fallbacks cannot be counted.
+    """
+    with _decode_stats_lock:
+        stats = {key: dict(value) if isinstance(value, dict) else value for key, value in _decode_stats.items()}
+    if stats["non_speech_passes"]:
+        rate = stats["non_speech_fallbacks"] / stats["non_speech_passes"]
+    else:
+        rate = stats["fallback_decodes"] / max(1, stats["decode_passes"])
+    stats["fallback_decodes_avoided_estimate"] = round(stats["decode_passes_avoided"] * rate, 1)
+    return stats
+
+def _count_decode_passes(segments):
+    """Count decoder passes from the temperature each 30 s decode window settled on"""
+    passes = 0
+    fallbacks = 0
+    for temperature in {segment.get("seek", index): segment.get("temperature", 0.0)
+                        for index, segment in enumerate(segments)}.values():
+        retries = int(round((temperature or 0.0) / 0.2))
+        passes += retries + 1
+        fallbacks += retries
+    return passes, fallbacks
+
+def decode_audio(model, audio, transcribe_options, use_vad=None, window=False):
+    """
+    Run the model on an in-memory audio array, optionally skipping non-speech.
+    
+    With the VAD pre-filter enabled only the detected speech regions are decoded
+    and the resulting timestamps are mapped back onto the original audio. For
+    windows of a longer file, the non-speech classifier can label the window as
+    music, noise or silence first; such windows are not decoded at all, which also
+    avoids the temperature fallback re-decodes Whisper tends to run on music.
+    
+    Args:
+        model: Model loaded by `get_model`
+        audio: 1-D float32 audio at 16 kHz
+        transcribe_options: Keyword arguments for the engine's `transcribe`
+        use_vad: Override for the WHISPER_VAD setting
+        window: Whether `audio` is one window of a longer file
+        
+    Returns:
+        Tuple of (result dict as returned by Whisper, skipped_seconds)
+    """
+    import math
+    from core.audio import SAMPLE_RATE
+    from core.engines import get_engine
+    from core.qos import get_governor
+    
+    # Follow the cores the governor currently leaves to transcription
+    get_governor().apply()
+    engine = get_engine()
+    if window and is_non_speech_skip_enabled():
+        from core.vad import classify_window
+        
+        label = classify_window(audio)
+        if label != "speech":
+            duration = len(audio) / SAMPLE_RATE
+            passes = max(1, math.ceil(duration / 30.0))
+            with _decode_stats_lock:
+                _decode_stats["windows_skipped"][label] += 1
+                _decode_stats["decode_passes_avoided"] += passes
+            segments = []
+            if label == "music":
+                # Same placeholder Whisper produces, which the translator passes through
+                segments.append({"id": 0, "start": 0.0, "end": duration, "text": "(Music)",
+                                 "no_speech_prob": 1.0, "temperature": 0.0})
+            print(f"Skipped {label} window ({duration:.1f}s) without decoding")
+            return {"text": "", "segments": segments, "language": transcribe_options.get("language")}, duration
+    
+    if use_vad is None:
+        use_vad = is_vad_enabled()
+    if not use_vad:
+        result = engine.transcribe(model, audio, **transcribe_options)
+        skipped_seconds = 0.0
+    else:
+        from core.vad import apply_vad, remap_timestamps
+        
+        speech_audio, regions, skipped_seconds = apply_vad(audio)
+        if len(speech_audio) == 0:
+            return {"text": "", "segments": [], "language": transcribe_options.get("language")}, skipped_seconds
+        
+        result = engine.transcribe(model, speech_audio, **transcribe_options)
+        result["segments"] = remap_timestamps(result.get("segments", []), regions)
+    
+    segments = result.get("segments", [])
+    passes, fallbacks = _count_decode_passes(segments)
+    non_speech = window and all(segment.get("no_speech_prob", 0.0) > NO_SPEECH_THRESHOLD for segment in segments)
+    with _decode_stats_lock:
+        _decode_stats["windows_decoded"] += 1
+        _decode_stats["decode_passes"] += passes
+        _decode_stats["fallback_decodes"] += fallbacks
+        if non_speech and passes:
+            _decode_stats["non_speech_passes"] += passes
+            _decode_stats["non_speech_fallbacks"] += fallbacks
+    return result, skipped_seconds
+
+def transcribe(audio_path, task="transcribe"):
     """
     Transcribe audio using OpenAI's Whisper model.
     
     Args:
         audio_path: Path to the audio file
+        task: "transcribe", or "translate" for English subtitles of any language
         
     Returns:
         List of segments with start time, end time, and text
@@ -133,15 +787,44 @@ def transcribe(audio_path):
     if model_size in model_info:
         print(f"Model info: {model_info[model_size]}")
     
-    # Check if we need to manually download the model
-    if not is_model_downloaded(model_size):
-        print(f"Model not found locally. Downloading {model_size} model (this may take a while)...")
-        downloaded = download_model_manually(model_size)
-        if not downloaded:
-            print("Could not manually download model, trying standard method...")
+    from core.audio import fingerprint_wav
+    from core.engines import get_engine
+    
+    model_size, decode_options = select_configuration(audio_path, model_size)
+    decode_options = _with_task(decode_options, task)
+    fingerprint = fingerprint_wav(audio_path)
+    cache_key = transcript_cache_key(fingerprint, model_size, language, decode_options)
+    if is_result_cache_enabled():
+        cached = get_transcript_cache().get(cache_key)
+        if cached is not None:
+            print(f"Using cached transcription: {len(cached)} segments")
+            return cached
+    
+    workers = int(os.environ.get("WHISPER_WORKERS", "1") or 1)
+    if workers > 1:
+        segments = transcribe_parallel(audio_path, workers, model_size=model_size, language=language,
+                                       fingerprint=fingerprint, decode_options=decode_options)
+        get_transcript_cache().put(cache_key, segments)
+        return segments
+    
+    from core.audio import get_wav_duration
+    
+    # Whisper loads a whole file into one array, ~230 MB per hour of audio
+    # before its spectrogram; longer media is decoded window by window instead
+    if get_wav_duration(audio_path) > float(os.environ.get("WHISPER_STREAM_SECONDS", "1800")):
+        print("Long audio, transcribing window by window with bounded memory")
+        segments = []
+        for window_segments in iter_transcribe(audio_path, model_size=model_size, language=language, task=task):
+            segments.extend(window_segments)
+        return segments
     
     try:
-        model = whisper.load_model(model_size)
+        model = get_model(model_size)
+        if not language:
+            language = detect_media_language(model, audio_path, fingerprint)
+        stats = get_model_registry().stats()
+        print(f"Model registry: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['load_time_total']:.2f}s total load time, {stats['memory_mb']:.0f} MB cached")
         
         # Transcribe the audio
         print(f"Transcribing audio: {audio_path}")
@@ -149,14 +832,37 @@ def transcribe(audio_path):
         # Prepare transcription options
         transcribe_options = {
             "verbose": True,  # Show progress
-            "fp16": False     # Set to True if GPU is available for faster processing
+            "fp16": get_precision() == "fp16"  # Half precision only helps on GPU
         }
         
         # Add language if specified
         if language:
             transcribe_options["language"] = language
+        transcribe_options.update(decode_options)
         
-        result = model.transcribe(audio_path, **transcribe_options)
+        if is_vad_enabled():
+            from core.audio import load_wav_pcm, SAMPLE_RATE
+            audio = load_wav_pcm(audio_path)
+            result, skipped_seconds = decode_audio(model, audio, transcribe_options, use_vad=True)
+            duration = len(audio) / SAMPLE_RATE
+            print(f"VAD skipped {skipped_seconds:.1f}s of {duration:.1f}s of audio "
+                  f"({100 * skipped_seconds / max(duration, 1e-6):.0f}%)")
+        else:
+            from core.audio import PcmAudio, load_wav_pcm
+            from core.features import cached_mel, is_mel_cache_enabled
+            from core.qos import get_governor
+            get_governor().apply()
+            audio, windows = audio_path, ()
+            if isinstance(audio_path, PcmAudio):
+                # Decoded samples are handed to the engine, which would otherwise run ffmpeg again
+                audio = load_wav_pcm(audio_path)
+                windows = [(0, len(audio), audio)]
+            if is_mel_cache_enabled():
+                # Skips audio decoding and the STFT when this audio was seen before
+                with cached_mel(audio_path, fingerprint, windows=windows):
+                    result = get_engine().transcribe(model, audio, **transcribe_options)
+            else:
+                result = get_engine().transcribe(model, audio, **transcribe_options)
         
         # Return the segments which contain start time, end time, and text
         if "segments" not in result:
@@ -164,8 +870,703 @@ def transcribe(audio_path):
             return []
             
         print(f"Transcription complete: {len(result['segments'])} segments identified")
+        get_transcript_cache().put(cache_key, result["segments"])
         return result["segments"]
     
     except Exception as e:
         print(f"Error during transcription: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
+
+def offset_segments(segments, offset_seconds, first_id=0):
+    """
+    Shift segment (and word) timestamps by `offset_seconds` and renumber ids.
+    
+    Args:
+        segments: Segments returned by Whisper for a slice of the audio
+        offset_seconds: Start of that slice in the full audio
+        first_id: Id assigned to the first segment
+        
+    Returns:
+        New list of shifted segment dicts
+    """
+    shifted = []
+    for index, segment in enumerate(segments):
+        segment = dict(segment)
+        segment["id"] = first_id + index
+        segment["start"] = segment.get("start", 0) + offset_seconds
+        segment["end"] = segment.get("end", 0) + offset_seconds
+        if segment.get("words"):
+            segment["words"] = [
+                dict(word, start=word["start"] + offset_seconds, end=word["end"] + offset_seconds)
+                for word in segment["words"]
+            ]
+        shifted.append(segment)
+    return shifted
+
+def range_bounds(segments, start_seconds, end_seconds):
+    """
+    Widen [start_seconds, end_seconds] to the segments it cuts through.
+    
+    Re-transcribing a range replaces whole segments, so a segment that is only
+    partly inside the range is decoded again with it instead of being cut.
+    
+    Returns:
+        Tuple of (start_seconds, end_seconds)
+    """
+    for segment in segments:
+        if segment.get("start", 0.0) < end_seconds and segment.get("end", 0.0) > start_seconds:
+            start_seconds = min(start_seconds, segment.get("start", 0.0))
+            end_seconds = max(end_seconds, segment.get("end", 0.0))
+    return start_seconds, end_seconds
+
+def splice_segments(segments, replacement, start_seconds, end_seconds):
+    """
+    Replace the segments overlapping [start_seconds, end_seconds] with `replacement`.
+    
+    Args:
+        segments: Segments of the full audio, in playback order
+        replacement: Segments of the range, with timestamps in the full audio
+        start_seconds: Start of the re-transcribed range
+        end_seconds: End of the re-transcribed range
+        
+    Returns:
+        New list of segments in playback order with renumbered ids
+    """
+    before = [segment for segment in segments if segment.get("end", 0.0) <= start_seconds]
+    after = [segment for segment in segments if segment.get("start", 0.0) >= end_seconds]
+    return offset_segments(before + list(replacement) + after, 0)
+
+def transcribe_range(audio_path, start_seconds, end_seconds, model_size=None, language=None, prompt=None,
+                     task="transcribe"):
+    """
+    Transcribe only [start_seconds, end_seconds] of the audio, for example to redo
+    a region that came out wrong with another model size, language or prompt.
+    
+    Only that slice of the WAV is read and decoded, so the cost depends on the
+    length of the range and not of the media. The result is not cached: it is
+    meant to be spliced into the full transcript with `splice_segments`.
+    
+    Args:
+        audio_path: 16 kHz mono WAV path, or the `PcmAudio` decoded by the worker
+        start_seconds: Start of the range in the full audio
+        end_seconds: End of the range in the full audio
+        model_size: Whisper model size, defaults to WHISPER_MODEL_SIZE
+        language: Language code, or None to detect it on the range itself
+        prompt: Optional initial prompt (names, spelling, preceding text)
+        task: "transcribe", or "translate" for English subtitles of any language
+        
+    Returns:
+        List of segments with timestamps relative to the full audio
+    """
+    from core.audio import load_wav_pcm, SAMPLE_RATE
+    
+    model_size = model_size or os.environ.get("WHISPER_MODEL_SIZE", "small")
+    start_sample = max(0, int(start_seconds * SAMPLE_RATE))
+    audio = load_wav_pcm(audio_path, start_sample, int(end_seconds * SAMPLE_RATE))
+    if len(audio) == 0:
+        return []
+    start_seconds = start_sample / SAMPLE_RATE
+    end_seconds = start_seconds + len(audio) / SAMPLE_RATE
+    
+    transcribe_options = {"verbose": False, "fp16": get_precision() == "fp16"}
+    if language:
+        transcribe_options["language"] = language
+    if prompt:
+        transcribe_options["initial_prompt"] = prompt
+    transcribe_options = _with_task(transcribe_options, task)
+    
+    print(f"Re-transcribing {start_seconds:.1f}s-{end_seconds:.1f}s with the {model_size} model")
+    model = get_model(model_size)
+    result, _ = decode_audio(model, audio, transcribe_options)
+    segments = offset_segments(result.get("segments", []), start_seconds)
+    for segment in segments:
+        # Whisper pads short input, so the last timestamps can run past the slice
+        segment["start"] = min(max(segment["start"], start_seconds), end_seconds)
+        segment["end"] = min(max(segment["end"], segment["start"]), end_seconds)
+    print(f"Range re-transcribed: {len(segments)} segments")
+    return segments
+
+def _parallel_worker_init(torch_threads, niceness=0):
+    """Initializer for transcription pool processes"""
+    if niceness and hasattr(os, "nice"):
+        try:
+            # Below the player, so playback keeps its share of the CPU
+            os.nice(niceness)
+        except OSError:
+            pass
+    from core.qos import set_process_threads
+    
+    # `decode_audio` applies the governor, which keeps this process to its share
+    set_process_threads(torch_threads).apply()
+
+def _transcribe_chunk(index, audio_path, start_sample, end_sample, model_size, transcribe_options):
+    """Transcribe one chunk of the audio file (or of `PcmAudio` already cut to the chunk) inside a pool process"""
+    from core.audio import PcmAudio, load_wav_pcm, SAMPLE_RATE
+    
+    if isinstance(audio_path, PcmAudio):
+        audio = load_wav_pcm(audio_path)
+    else:
+        audio = load_wav_pcm(audio_path, start_sample, end_sample)
+    model = get_model(model_size)
+    result, skipped_seconds = decode_audio(model, audio, transcribe_options, window=True)
+    return index, offset_segments(result.get("segments", []), start_sample / SAMPLE_RATE), skipped_seconds
+
+def transcribe_parallel(audio_path, workers, model_size=None, language=None, target_chunk_seconds=None,
+                        fingerprint=None, decode_options=None):
+    """
+    Transcribe audio by splitting it at silences and decoding chunks in a process pool.
+    
+    Each pool process loads its own model. Chunks are merged back in their original
+    order with timestamps shifted to the position of the chunk in the full audio, so
+    the result does not depend on which process finishes first.
+    
+    Args:
+        audio_path: 16 kHz mono WAV path, or the `PcmAudio` decoded by the worker
+        workers: Number of worker processes
+        model_size: Whisper model size, defaults to WHISPER_MODEL_SIZE
+        language: Language code, or None to auto-detect per chunk
+        target_chunk_seconds: Desired chunk length, defaults to WHISPER_CHUNK_SECONDS or 60
+        fingerprint: Media fingerprint used to cache the detected language
+        decode_options: Extra options for `model.transcribe`, e.g. beam size
+        
+    Returns:
+        List of segments with start time, end time, and text
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from core.audio import PcmAudio, find_wav_silence_splits, SAMPLE_RATE
+    
+    model_size = model_size or os.environ.get("WHISPER_MODEL_SIZE", "small")
+    if target_chunk_seconds is None:
+        target_chunk_seconds = float(os.environ.get("WHISPER_CHUNK_SECONDS", "60"))
+    
+    chunks = find_wav_silence_splits(audio_path, target_chunk_seconds=target_chunk_seconds)
+    if not chunks:
+        return []
+    
+    if not language:
+        # Detect once here rather than in every chunk
+        language = detect_media_language(get_model(model_size), audio_path, fingerprint)
+    
+    from core.qos import get_governor
+    
+    workers = max(1, min(workers, len(chunks)))
+    governor = get_governor()
+    torch_threads, cpus, niceness = governor.process_settings(workers)
+    print(f"Parallel transcription: {len(chunks)} chunks across {workers} processes "
+          f"({torch_threads} torch threads each on {len(cpus)} cores)")
+    
+    transcribe_options = {"verbose": False, "fp16": get_precision() == "fp16"}
+    if language:
+        transcribe_options["language"] = language
+    transcribe_options.update(decode_options or {})
+    
+    # Spawn keeps torch and Qt state from being forked into the pool
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    results = {}
+    skipped_total = 0.0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_parallel_worker_init, initargs=(torch_threads, niceness)) as pool:
+        futures = [
+            # In-memory audio is sent to each process one chunk at a time
+            pool.submit(_transcribe_chunk, index,
+                        audio_path.slice(chunk_start, chunk_end) if isinstance(audio_path, PcmAudio) else audio_path,
+                        chunk_start, chunk_end, model_size, transcribe_options)
+            for index, (chunk_start, chunk_end) in enumerate(chunks)
+        ]
+        # The pool's processes, now started, follow the governor's core allocation
+        governor.track_processes([process.pid for process in multiprocessing.active_children()])
+        try:
+            for future in futures:
+                index, chunk_segments, skipped_seconds = future.result()
+                results[index] = chunk_segments
+                skipped_total += skipped_seconds
+                print(f"Chunk {index + 1}/{len(chunks)} done: {len(chunk_segments)} segments")
+        finally:
+            governor.release_processes()
+    
+    segments = []
+    for index in range(len(chunks)):
+        segments.extend(offset_segments(results[index], 0, first_id=len(segments)))
+    
+    elapsed = time.perf_counter() - start
+    duration = chunks[-1][1] / SAMPLE_RATE
+    print(f"Parallel transcription complete: {len(segments)} segments in {elapsed:.1f}s "
+          f"({duration / max(elapsed, 1e-6):.2f}x realtime)")
+    if is_vad_enabled():
+        print(f"VAD skipped {skipped_total:.1f}s of {duration:.1f}s of audio")
+    return segments
+
+def iter_transcribe(audio_path, model_size=None, language=None, window_seconds=30.0, resume=True,
+                    task="transcribe", scheduler=None):
+    """
+    Transcribe audio window by window, yielding segments as each window is decoded.
+    
+    Windows of about `window_seconds` are cut at the quietest point near each
+    boundary. The text of the previous window is passed as the prompt of the next
+    one so the decoder keeps its context, and the language is detected once for the
+    whole file by `detect_media_language`.
+    
+    Progress is checkpointed after every window. When the same media is transcribed
+    again with the same settings after an interruption, the saved segments are
+    yielded first and decoding resumes after the last completed window.
+    
+    Windows are decoded in order unless a `scheduler` is given, whose
+    `next_window` picks each next window from the pending ones, for example the
+    one at the playhead. The segments of every window keep their timestamps in
+    the full audio either way.
+    
+    A `StreamingPcm` that ffmpeg is still decoding is transcribed as it arrives:
+    windows are cut as their audio is delivered and decoded in order, or in the
+    scheduler's order. When the playhead is past the audio delivered so far, the
+    stream is asked to decode up to it, and the windows there are decoded as soon
+    as they are cut. The cache lookup needs a fingerprint recorded for the media
+    by an earlier run; without one the result is cached once decoding ends. The
+    checkpoint of a `StreamingPcm` is keyed by the media file's path, size and
+    modification time, so it is found before any audio has been hashed.
+    
+    Args:
+        audio_path: 16 kHz mono WAV path, or the `PcmAudio` decoded by the worker
+        model_size: Whisper model size, defaults to WHISPER_MODEL_SIZE
+        language: Language code, defaults to WHISPER_LANGUAGE or auto-detect
+        window_seconds: Approximate length of each decoded window
+        resume: Whether to continue from a matching checkpoint
+        task: "transcribe", or "translate" for English subtitles of any language
+        scheduler: Optional `PlayheadScheduler` choosing the decoding order
+        
+    Yields:
+        List of segments for each window, with timestamps relative to the full audio
+    """
+    import math
+    from core.audio import (StreamingPcm, PcmDigest, find_wav_silence_splits, iter_stream_silence_splits,
+                            iter_wav_windows, load_wav_pcm, fingerprint_wav, SAMPLE_RATE)
+    from core.cache import TranscriptionCheckpoint
+    
+    model_size = model_size or os.environ.get("WHISPER_MODEL_SIZE", "small")
+    language = language or os.environ.get("WHISPER_LANGUAGE", None)
+    
+    model_size, decode_options = select_configuration(audio_path, model_size)
+    decode_options = _with_task(decode_options, task)
+    # Hashing the audio would wait for ffmpeg to finish
+    streaming = isinstance(audio_path, StreamingPcm) and not audio_path.complete
+    fingerprint = audio_path.known_fingerprint if streaming else fingerprint_wav(audio_path)
+    cache_key = checkpoint = state = None
+    requested_language = language  # Keys use the language asked for, not the detected one
+    
+    if fingerprint:
+        cache_key = transcript_cache_key(fingerprint, model_size, requested_language, decode_options)
+        if is_result_cache_enabled():
+            cached = get_transcript_cache().get(cache_key)
+            if cached is not None:
+                print(f"Using cached transcription: {len(cached)} segments")
+                yield cached
+                return
+    
+    # Decoded media is checkpointed by its file, known before the fingerprint is,
+    # and checked against a hash of the decoded prefix before it is resumed
+    if isinstance(audio_path, StreamingPcm) and audio_path.media_key:
+        checkpoint_key = f"media:{audio_path.media_key}"
+        prefix = PcmDigest(audio_path)
+    else:
+        checkpoint_key = fingerprint
+        prefix = None
+    if checkpoint_key:
+        checkpoint = TranscriptionCheckpoint(checkpoint_key,
+                                             dict(decode_settings(model_size, requested_language, decode_options),
+                                                  window_seconds=window_seconds))
+        state = checkpoint.load() if resume else None
+        if state is not None and prefix is not None:
+            prefix.update(state["completed_sample"])
+            if prefix.hexdigest() != state.get("audio_digest"):
+                print("Ignoring checkpoint made with different audio")
+                state = None
+                prefix = PcmDigest(audio_path)
+    
+    model = get_model(model_size)
+    if state is not None:
+        language = state.get("language") or language
+    if not language:
+        language = detect_media_language(model, audio_path, fingerprint)
+    
+    # Only the window being decoded and a few read ahead are ever in memory
+    split_options = {"target_chunk_seconds": window_seconds, "search_seconds": min(5.0, window_seconds / 4)}
+    windows = [] if streaming else find_wav_silence_splits(audio_path, **split_options)
+    
+    done = {}     # window index -> segments of that window
+    carried = {}  # window index -> prompt in effect after that window
+    skipped_total = 0.0
+    completed_sample = 0
+    contiguous = 0  # windows decoded from the start, which the checkpoint holds
+    resumed_segments = None  # checkpointed segments, until assigned to a resumed window
+    
+    def mark_resumed(index):
+        # A window decoded before the interruption; the first one holds all their segments
+        nonlocal resumed_segments, contiguous
+        done[index] = resumed_segments or []
+        carried[index] = state.get("prompt")
+        resumed_segments = None
+        while contiguous in done:
+            contiguous += 1
+    
+    if state is not None and state["segments"]:
+        completed_sample = state["completed_sample"]
+        resumed_segments = state["segments"]
+        # Streamed windows are marked as they are cut
+        for index, (_, window_end) in enumerate(windows):
+            if window_end <= completed_sample:
+                mark_resumed(index)
+        print(f"Resuming transcription at {completed_sample / SAMPLE_RATE:.1f}s "
+              f"with {len(state['segments'])} checkpointed segments")
+        yield list(state["segments"])
+    
+    def ordered(count=None):
+        segments = []
+        for index in sorted(done) if count is None else range(count):
+            segments.extend(offset_segments(done[index], 0, first_id=len(segments)))
+        return segments
+    
+    from core.features import MelCache, mel_sources, is_mel_cache_enabled
+    
+    # Computing the cached spectrogram needs the whole audio; while it streams in,
+    # only one stored by an earlier run of the same media is served
+    mel_cache = None
+    if is_mel_cache_enabled() and fingerprint:
+        mel_cache = MelCache(audio_path, fingerprint, compute=not streaming)
+    
+    def decode_window(index, audio):
+        nonlocal skipped_total, contiguous
+        window_start, window_end = windows[index]
+        # Out of order, the previous window may not be decoded yet to prompt this one
+        prompt = carried.get(index - 1)
+        transcribe_options = {"verbose": False, "fp16": get_precision() == "fp16"}
+        if language:
+            transcribe_options["language"] = language
+        if prompt:
+            transcribe_options["initial_prompt"] = prompt
+        transcribe_options.update(decode_options)
+        
+        features = [(audio, mel_cache.window(window_start, window_end))] if mel_cache else []
+        with mel_sources(features):
+            result, skipped_seconds = decode_audio(model, audio, transcribe_options, window=True)
+        skipped_total += skipped_seconds
+        
+        first_id = sum(len(done[earlier]) for earlier in done if earlier < index)
+        segments = offset_segments(result.get("segments", []), window_start / SAMPLE_RATE, first_id=first_id)
+        done[index] = segments
+        carried[index] = result.get("text", "").strip()[-200:] or prompt
+        print(f"Window {index + 1}/{'?' if streaming else len(windows)} decoded: {len(segments)} segments "
+              f"up to {window_end / SAMPLE_RATE:.1f}s")
+        
+        # The checkpoint holds the decoded prefix, which is all of it in playback order
+        if checkpoint is not None and contiguous in done:
+            while contiguous in done:
+                contiguous += 1
+            if prefix is not None:
+                prefix.update(windows[contiguous - 1][1])
+            try:
+                checkpoint.save(windows[contiguous - 1][1], ordered(contiguous),
+                                prompt=carried[contiguous - 1], language=language,
+                                audio_digest=prefix.hexdigest() if prefix is not None else None)
+            except OSError as e:
+                print(f"Warning: Could not save checkpoint: {e}")
+        return segments
+    
+    if streaming:
+        # Cut windows as ffmpeg delivers the audio, until the whole file is known
+        with closing(iter_stream_silence_splits(audio_path, **split_options)) as cuts:
+            cut = []  # indices of windows cut but not decoded yet
+            while scheduler is None or not audio_path.complete:
+                if scheduler is None:
+                    index = cut[0] if cut else None
+                else:
+                    # The audio beyond the cut windows competes as one window, chosen
+                    # when the playhead is past every window cut so far
+                    uncut = (None, (windows[-1][1] if windows else 0) / SAMPLE_RATE, math.inf)
+                    index = scheduler.next_window([(other, windows[other][0] / SAMPLE_RATE,
+                                                    windows[other][1] / SAMPLE_RATE) for other in cut] + [uncut])
+                if index is not None:
+                    cut.remove(index)
+                    yield decode_window(index, load_wav_pcm(audio_path, *windows[index]))
+                    continue
+                if scheduler is not None:
+                    # Back-pressure follows the playhead, so ffmpeg reaches a seek target
+                    audio_path.request(int((scheduler.playhead + window_seconds) * SAMPLE_RATE))
+                window = next(cuts, None)
+                if window is None:
+                    break
+                windows.append(window)
+                if window[1] <= completed_sample:
+                    # The cut points are those of the interrupted run
+                    mark_resumed(len(windows) - 1)
+                    continue
+                cut.append(len(windows) - 1)
+        streaming = False
+        print(f"Audio fully decoded, {len(windows)} windows cut while it was arriving")
+        if not fingerprint:
+            fingerprint = fingerprint_wav(audio_path)
+            cache_key = transcript_cache_key(fingerprint, model_size, requested_language, decode_options)
+        # The same cut points, so the decoded windows are a prefix of these
+        windows = find_wav_silence_splits(audio_path, **split_options)
+        for index, (_, window_end) in enumerate(windows):
+            if window_end <= completed_sample and index not in done:
+                mark_resumed(index)
+        if is_mel_cache_enabled():
+            mel_cache = MelCache(audio_path, fingerprint)
+    
+    pending = [index for index, (_, window_end) in enumerate(windows)
+               if window_end > completed_sample and index not in done]
+    if scheduler is None:
+        with closing(iter_wav_windows(audio_path, [windows[index] for index in pending])) as window_audio:
+            for index, (_, _, audio) in zip(pending, window_audio):
+                yield decode_window(index, audio)
+    else:
+        pending = set(pending)
+        while pending:
+            index = scheduler.next_window([(index, windows[index][0] / SAMPLE_RATE, windows[index][1] / SAMPLE_RATE)
+                                           for index in sorted(pending)])
+            pending.discard(index)
+            yield decode_window(index, load_wav_pcm(audio_path, *windows[index]))
+    
+    if is_vad_enabled() and windows:
+        print(f"VAD skipped {skipped_total:.1f}s of {windows[-1][1] / SAMPLE_RATE:.1f}s of audio")
+    if is_non_speech_skip_enabled():
+        stats = get_decode_stats()
+        print(f"Non-speech windows skipped: {stats['windows_skipped']}, "
+              f"{stats['decode_passes_avoided']} decoder passes and about "
+              f"{stats['fallback_decodes_avoided_estimate']} fallback re-decodes avoided (estimated); "
+              f"{stats['fallback_decodes']} fallbacks of {stats['decode_passes']} passes ran")
+    
+    # Only reached when every window was decoded
+    get_transcript_cache().put(cache_key, ordered())
+    if checkpoint is not None:
+        checkpoint.clear()
+
+def iter_draft_and_refine(audio_path, model_size=None, language=None, draft_model_size="tiny",
+                          window_seconds=30.0, task="transcribe"):
+    """
+    Transcribe in two passes: a fast draft of the whole file, then a refinement.
+    
+    The draft model decodes every window first so subtitles are available almost
+    immediately. The configured model then re-decodes the windows in order, and
+    each refined window replaces the draft segments of that region. Both passes use
+    the same window cuts and, through the on-disk mel cache, the same log-mel
+    features. Windows are read from the file as each pass reaches them, so memory
+    does not grow with the length of the audio.
+    
+    Args:
+        audio_path: 16 kHz mono WAV path, or the `PcmAudio` decoded by the worker
+        model_size: Refinement model size, defaults to WHISPER_MODEL_SIZE
+        language: Language code, defaults to WHISPER_LANGUAGE or auto-detect
+        draft_model_size: Model used for the draft pass
+        window_seconds: Approximate length of each decoded window
+        task: "transcribe", or "translate" for English subtitles of any language
+        
+    Yields:
+        Tuple of (stage, segments) where stage is "draft" or "refine" and segments is
+        the full current subtitle list, draft regions not yet refined included
+    """
+    from core.audio import find_wav_silence_splits, iter_wav_windows, fingerprint_wav, SAMPLE_RATE
+    from core.features import MelCache, mel_sources, is_mel_cache_enabled
+    
+    model_size = model_size or os.environ.get("WHISPER_MODEL_SIZE", "small")
+    language = language or os.environ.get("WHISPER_LANGUAGE", None)
+    
+    model_size, decode_options = select_configuration(audio_path, model_size)
+    decode_options = _with_task(decode_options, task)
+    fingerprint = fingerprint_wav(audio_path)
+    cache_key = transcript_cache_key(fingerprint, model_size, language, decode_options)
+    if is_result_cache_enabled():
+        cached = get_transcript_cache().get(cache_key)
+        if cached is not None:
+            print(f"Using cached transcription: {len(cached)} segments")
+            yield "refine", cached
+            return
+    
+    draft_model = get_model(draft_model_size)
+    if not language:
+        # The detection is cached per media, so the refine pass reuses it
+        language = detect_media_language(draft_model, audio_path, fingerprint)
+    
+    splits = find_wav_silence_splits(audio_path, target_chunk_seconds=window_seconds,
+                                     search_seconds=min(5.0, window_seconds / 4))
+    window_segments = [[] for _ in splits]
+    mel_cache = MelCache(audio_path, fingerprint) if is_mel_cache_enabled() else None
+    
+    def merged():
+        segments = []
+        for segments_in_window in window_segments:
+            segments.extend(offset_segments(segments_in_window, 0, first_id=len(segments)))
+        return segments
+    
+    def decode_pass(model, extra_options):
+        prompt = None
+        with closing(iter_wav_windows(audio_path, splits)) as window_audio:
+            for index, (window_start, window_end, window) in enumerate(window_audio):
+                transcribe_options = {"verbose": False, "fp16": get_precision() == "fp16"}
+                if language:
+                    transcribe_options["language"] = language
+                if prompt:
+                    transcribe_options["initial_prompt"] = prompt
+                transcribe_options.update(extra_options)
+                
+                features = [(window, mel_cache.window(window_start, window_end))] if mel_cache else []
+                with mel_sources(features):
+                    result, _ = decode_audio(model, window, transcribe_options, window=True)
+                window_segments[index] = offset_segments(result.get("segments", []), window_start / SAMPLE_RATE)
+                prompt = result.get("text", "").strip()[-200:] or prompt
+                yield index
+    
+    start = time.perf_counter()
+    for index in decode_pass(draft_model, _with_task({}, task)):
+        yield "draft", merged()
+    print(f"Draft pass ({draft_model_size}) finished in {time.perf_counter() - start:.1f}s")
+    
+    start = time.perf_counter()
+    model = get_model(model_size)
+    for index in decode_pass(model, decode_options):
+        yield "refine", merged()
+    print(f"Refine pass ({model_size}) finished in {time.perf_counter() - start:.1f}s")
+    
+    get_transcript_cache().put(cache_key, merged())
+
+def segments_from_tokens(tokens, tokenizer, offset_seconds, window_seconds, first_id=0):
+    """
+    Split decoded tokens into segments at Whisper's timestamp tokens.
+    
+    Args:
+        tokens: Token ids of one decoded window (without the SOT sequence)
+        tokenizer: Whisper tokenizer used for decoding
+        offset_seconds: Start of the window in the full audio
+        window_seconds: Length of the window, used to close a trailing segment
+        first_id: Id assigned to the first segment
+        
+    Returns:
+        List of segments with start time, end time, and text
+    """
+    segments = []
+    start = 0.0
+    text_tokens = []
+    
+    def emit(end):
+        text = tokenizer.decode(text_tokens)
+        if text.strip():
+            segments.append({
+                "id": first_id + len(segments),
+                "start": offset_seconds + start,
+                "end": offset_seconds + max(start, end),
+                "text": text,
+                "tokens": list(text_tokens),
+            })
+    
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            timestamp = (token - tokenizer.timestamp_begin) * 0.02
+            if text_tokens:
+                emit(timestamp)
+                text_tokens = []
+            start = timestamp
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+    
+    if text_tokens:
+        emit(window_seconds)
+    return segments
+
+def decode_windows_batched(model, windows, language=None, batch_size=8, task="transcribe"):
+    """
+    Greedily decode independent audio windows in batched forward passes.
+    
+    Every window must be at most 30 seconds. Windows are padded to Whisper's input
+    length, stacked into batches of `batch_size` log-mel spectrograms and decoded
+    with a single encoder and decoder pass per batch. There is no temperature
+    fallback or cross-window prompt, which is what allows the batching.
+    
+    Args:
+        model: Loaded Whisper model
+        windows: List of (offset_seconds, audio) tuples
+        language: Language code, or None to detect per window
+        batch_size: Number of windows per forward pass
+        task: "transcribe", or "translate" to decode English text
+        
+    Returns:
+        List of segment lists, one per window, with global timestamps
+    """
+    import torch
+    from whisper.audio import N_SAMPLES, SAMPLE_RATE
+    from whisper.tokenizer import get_tokenizer
+    from core.engines import get_engine
+    
+    if get_engine().name != "whisper":
+        raise ValueError("Batched decoding is only implemented for the whisper engine")
+    
+    n_mels = getattr(model.dims, "n_mels", 80)
+    fp16 = get_precision() == "fp16" and model.device.type != "cpu"
+    options = whisper.DecodingOptions(task=task, language=language, fp16=fp16, without_timestamps=False)
+    
+    results = []
+    for batch_start in range(0, len(windows), batch_size):
+        batch = windows[batch_start:batch_start + batch_size]
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio), N_SAMPLES), n_mels=n_mels)
+            for _, audio in batch
+        ]).to(model.device)
+        if fp16:
+            mel = mel.half()
+        
+        with torch.no_grad():
+            decoded = whisper.decode(model, mel, options)
+        
+        for (offset, audio), result in zip(batch, decoded):
+            tokenizer_options = {"language": result.language, "task": task}
+            if hasattr(model, "num_languages"):
+                tokenizer_options["num_languages"] = model.num_languages
+            tokenizer = get_tokenizer(model.is_multilingual, **tokenizer_options)
+            segments = segments_from_tokens(result.tokens, tokenizer, offset, len(audio) / SAMPLE_RATE)
+            for segment in segments:
+                segment.update(avg_logprob=result.avg_logprob, no_speech_prob=result.no_speech_prob,
+                               compression_ratio=result.compression_ratio, temperature=result.temperature)
+            results.append(segments)
+    return results
+
+def transcribe_batched(audio_path, batch_size=None, model_size=None, language=None):
+    """
+    Throughput-oriented transcription that decodes several windows per forward pass.
+    
+    The audio is cut at silences into windows of at most 30 seconds, which are then
+    decoded in batches by `decode_windows_batched`. This trades Whisper's sequential
+    context and temperature fallback for better utilization of many-core CPUs, so it
+    is meant for bulk jobs rather than the interactive single-stream path.
+    
+    Args:
+        audio_path: 16 kHz mono WAV path, or the `PcmAudio` decoded by the worker
+        batch_size: Windows per forward pass, defaults to WHISPER_BATCH_SIZE or 8
+        model_size: Whisper model size, defaults to WHISPER_MODEL_SIZE
+        language: Language code, defaults to WHISPER_LANGUAGE or per-window detection
+        
+    Returns:
+        List of segments with start time, end time, and text
+    """
+    from core.audio import load_wav_pcm, find_silence_splits, fingerprint_wav, SAMPLE_RATE
+    
+    batch_size = batch_size or int(os.environ.get("WHISPER_BATCH_SIZE", "8"))
+    model_size = model_size or os.environ.get("WHISPER_MODEL_SIZE", "small")
+    language = language or os.environ.get("WHISPER_LANGUAGE", None)
+    model = get_model(model_size)
+    if not language:
+        language = detect_media_language(model, audio_path, fingerprint_wav(audio_path))
+    
+    audio = load_wav_pcm(audio_path)
+    # 25 s targets with a 5 s search keep every window within Whisper's 30 s input
+    splits = find_silence_splits(audio, target_chunk_seconds=25.0, search_seconds=5.0)
+    windows = [(start / SAMPLE_RATE, audio[start:end]) for start, end in splits]
+    
+    start = time.perf_counter()
+    segments = []
+    for window_segments in decode_windows_batched(model, windows, language=language, batch_size=batch_size):
+        segments.extend(offset_segments(window_segments, 0, first_id=len(segments)))
+    elapsed = time.perf_counter() - start
+    
+    print(f"Batched transcription complete: {len(segments)} segments from {len(windows)} windows "
+          f"in {elapsed:.1f}s (batch size {batch_size}, {len(audio) / SAMPLE_RATE / max(elapsed, 1e-6):.2f}x realtime)")
+    return segments
@@ -0,0 +1,186 @@
+import numpy as np
+
+from core.audio import SAMPLE_RATE
+
+def frame_features(audio, frame_length=480, hop_length=160, block_frames=2048):
+    """
+    Compute per-frame energy (dB) and spectral flatness for a mono signal.
+
+    Frames are analysed `block_frames` at a time, so the framed copy and its
+    spectrum never exceed one block (about 20 s at the defaults) however long
+    the audio is.
+
+    Args:
+        audio: 1-D float32 audio
+        frame_length: Samples per analysis frame (30 ms at 16 kHz)
+        hop_length: Samples between frames (10 ms at 16 kHz)
+        block_frames: Frames analysed at once
+
+    Returns:
+        Tuple of (energy_db, flatness) arrays, one value per frame
+    """
+    if len(audio) < frame_length:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    num_frames = 1 + (len(audio) - frame_length) // hop_length
+    energy_db = np.empty(num_frames, dtype=np.float32)
+    flatness = np.empty(num_frames, dtype=np.float32)
+    window = np.hanning(frame_length).astype(np.float32)
+    for first in range(0, num_frames, block_frames):
+        count = min(block_frames, num_frames - first)
+        frames = np.lib.stride_tricks.as_strided(
+            audio[first * hop_length:],
+            shape=(count, frame_length),
+            strides=(audio.strides[0] * hop_length, audio.strides[0]),
+            writeable=False,
+        )
+
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        energy_db[first:first + count] = 20.0 * np.log10(rms + 1e-10)
+
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-12
+        flatness[first:first + count] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+    return energy_db, flatness
+
+def detect_speech_regions(audio, sample_rate=SAMPLE_RATE, energy_margin_db=10.0,
+                          min_energy_db=-50.0, max_flatness=0.5, min_speech_seconds=0.25,
+                          min_silence_seconds=0.5, padding_seconds=0.2):
+    """
+    Find regions of an audio signal that likely contain speech.
+
+    A frame counts as speech when it is louder than the estimated noise floor by
+    `energy_margin_db` and its spectrum is not noise-like (spectral flatness below
+    `max_flatness`). Short gaps are bridged, short blips dropped, and every region
+    padded so word onsets and endings are kept.
+
+    Args:
+        audio: 1-D float32 audio
+        sample_rate: Sample rate of `audio`
+
+    Returns:
+        List of (start_sample, end_sample) tuples in order
+    """
+    hop_length = sample_rate // 100
+    frame_length = 3 * hop_length
+    energy_db, flatness = frame_features(audio, frame_length, hop_length)
+    if len(energy_db) == 0:
+        return []
+
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(noise_floor + energy_margin_db, min_energy_db)
+    is_speech = (energy_db > threshold) & (flatness < max_flatness)
+
+    # Rising/falling edges of the speech mask give the raw regions
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    frames_per_second = sample_rate / hop_length
+    min_silence = int(min_silence_seconds * frames_per_second)
+    min_speech = int(min_speech_seconds * frames_per_second)
+    padding = int(padding_seconds * sample_rate)
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    total = len(audio)
+    speech = []
+    for start, end in regions:
+        if end - start < min_speech:
+            continue
+        start_sample = max(0, start * hop_length - padding)
+        end_sample = min(total, end * hop_length + frame_length + padding)
+        if speech and start_sample <= speech[-1][1]:
+            speech[-1] = (speech[-1][0], end_sample)
+        else:
+            speech.append((start_sample, end_sample))
+    return speech
+
+def apply_vad(audio, sample_rate=SAMPLE_RATE):
+    """
+    Keep only the speech regions of an audio signal.
+
+    Returns:
+        Tuple of (speech_audio, regions, skipped_seconds) where `speech_audio` is the
+        concatenation of `regions`, to be passed to `remap_timestamps` after decoding
+    """
+    regions = detect_speech_regions(audio, sample_rate=sample_rate)
+    if not regions:
+        return np.zeros(0, dtype=np.float32), [], len(audio) / sample_rate
+    speech_audio = np.concatenate([audio[start:end] for start, end in regions])
+    skipped_seconds = (len(audio) - len(speech_audio)) / sample_rate
+    return speech_audio, regions, skipped_seconds
+
+def remap_timestamps(segments, regions, sample_rate=SAMPLE_RATE):
+    """
+    Map timestamps on concatenated speech audio back to the original timeline.
+
+    Args:
+        segments: Segments decoded from the audio returned by `apply_vad`
+        regions: The speech regions returned by `apply_vad`
+
+    Returns:
+        New list of segments with start/end (and word) times on the original audio
+    """
+    if not regions:
+        return [dict(segment) for segment in segments]
+
+    lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+    concat_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / sample_rate
+    original_starts = np.array([start for start, _ in regions]) / sample_rate
+
+    def remap(t, side='right'):
+        # Ends that fall exactly on a join belong to the region before it
+        index = max(0, int(np.searchsorted(concat_starts, t, side=side)) - 1)
+        return float(original_starts[index] + (t - concat_starts[index]))
+
+    remapped = []
+    for segment in segments:
+        segment = dict(segment)
+        segment["start"] = remap(segment.get("start", 0))
+        segment["end"] = max(segment["start"], remap(segment.get("end", 0), side='left'))
+        if segment.get("words"):
+            segment["words"] = [dict(word, start=remap(word["start"]), end=remap(word["end"], side='left'))
+                                for word in segment["words"]]
+        remapped.append(segment)
+    return remapped
+
+def classify_window(audio, sample_rate=SAMPLE_RATE, silence_db=-50.0, noise_flatness=0.45,
+                    music_low_energy_ratio=0.3):
+    """
+    Cheaply label an audio window as speech, music, noise or silence.
+
+    A window is only labelled as something other than speech when
+    `detect_speech_regions` finds no speech in it at all, so a few lines of
+    dialogue over music or room tone are still decoded. The remaining windows
+    are told apart by their frames: silence has no energy and noise has a flat
+    spectrum. Music keeps its level between notes and beats, while speech
+    drops to near silence between words many times a second, so a window with
+    few low-energy frames is music. Anything else is labelled speech so that it
+    still reaches the decoder.
+
+    Returns:
+        One of "speech", "music", "noise" or "silence"
+    """
+    hop_length = sample_rate // 100
+    energy_db, flatness = frame_features(audio, 3 * hop_length, hop_length)
+    if len(energy_db) < 100 or detect_speech_regions(audio, sample_rate=sample_rate):
+        return "speech"
+
+    # No speech region, so every frame below is a non-speech frame
+    if np.percentile(energy_db, 90) < silence_db:
+        return "silence"
+    if np.median(flatness) > noise_flatness:
+        return "noise"
+
+    # Share of frames well below the average level (pauses between words)
+    energy = 10.0 ** (energy_db / 10.0)
+    low_energy_ratio = float(np.mean(energy < 0.5 * energy.mean()))
+    if low_energy_ratio < music_low_energy_ratio:
+        return "music"
+    return "speech"
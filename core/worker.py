@@ -1,9 +1,12 @@
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 import os
+import math
+import time
 import tempfile
 import traceback
-import ffmpeg
-from core.transcriber import transcribe
+from core.audio import StreamingPcm, MediaPcm
+from core.transcriber import transcribe, iter_transcribe, iter_draft_and_refine
+from core.scheduler import PlayheadScheduler
 
 class TranscriptionWorker(QObject):
     """
@@ -12,17 +15,24 @@ class TranscriptionWorker(QObject):
     # Signals
     transcription_progress = pyqtSignal(str)  # To report progress
     transcription_complete = pyqtSignal(list)  # To return the transcribed segments
+    segments_partial = pyqtSignal(list)        # Segments decoded so far while transcription runs
     transcription_error = pyqtSignal(str)      # To report errors
     
     def __init__(self):
         super().__init__()
         self.video_path = None
+        self.audio = None  # StreamingPcm, set once audio extraction has started
+        self.stage_timings = {}  # Seconds since extraction started, see report_stage_timings
         self.temp_dir = tempfile.mkdtemp()
+        self.task = "transcribe"  # "translate" makes Whisper output English subtitles directly
+        self.scheduler = PlayheadScheduler()
         self._running = True
         
     def stop(self):
         """Signal the worker to stop processing"""
         self._running = False
+        if self.audio is not None:
+            self.audio.close()
         # Clean up temporary directory
         try:
             import shutil
@@ -32,6 +42,15 @@ class TranscriptionWorker(QObject):
         except Exception as e:
             print(f"Error cleaning up temp directory: {str(e)}")
         
+    def update_playhead(self, seconds, seek=False):
+        """
+        Report the playback position so the windows around it are decoded first.
+        
+        Called directly from the UI thread: the worker thread is busy decoding, so
+        a queued slot would only run after the transcription finished.
+        """
+        self.scheduler.set_playhead(seconds, seek=seek)
+        
     @pyqtSlot(str)
     def process_video(self, video_path):
         """Process the video and emit results"""
@@ -42,19 +61,39 @@ class TranscriptionWorker(QObject):
             # Report progress
             self.transcription_progress.emit("Extracting audio from video...")
             
-            # Extract audio
-            audio_path = os.path.join(self.temp_dir, "audio.wav")
-            self.extract_audio(video_path, audio_path)
+            # Extract audio; transcription starts while ffmpeg decodes the rest
+            if self.audio is not None:
+                self.audio.close()
+            self.audio = None
+            audio = self.extract_audio(video_path)
+            self.audio = audio
+            self.stage_timings = {}
             
             # Check if we were asked to stop
             if not self._running:
                 return
                 
             # Report progress
-            self.transcription_progress.emit("Transcribing audio with Whisper (this may take a while)...")
+            if self.task == "translate":
+                self.transcription_progress.emit("Translating audio to English with Whisper (this may take a while)...")
+            else:
+                self.transcription_progress.emit("Transcribing audio with Whisper (this may take a while)...")
             
             # Transcribe
-            segments = transcribe(audio_path)
+            self.mark_stage("transcription_start")
+            try:
+                if int(os.environ.get("WHISPER_WORKERS", "1") or 1) > 1:
+                    segments = transcribe(audio, task=self.task)
+                elif os.environ.get("WHISPER_DRAFT", "0") == "1":
+                    segments = self.transcribe_draft_then_refine(audio)
+                else:
+                    segments = self.transcribe_progressively(audio)
+            finally:
+                # Word timings and range re-transcription still read the rest of the
+                # audio, so ffmpeg is no longer held back by the decoder
+                audio.request(math.inf)
+            self.mark_stage("transcription_end")
+            self.report_stage_timings()
             
             # Check if we were asked to stop
             if not self._running:
@@ -63,10 +102,10 @@ class TranscriptionWorker(QObject):
             # Check if we got any segments
             if not segments:
                 self.transcription_error.emit("No speech detected in the audio")
-                return
-            
-            # Report completion
-            self.transcription_complete.emit(segments)
+            else:
+                # Report completion
+                self.transcription_complete.emit(segments)
+            self.release_audio(audio)
             
         except Exception as e:
             # Get full error details
@@ -86,26 +125,152 @@ class TranscriptionWorker(QObject):
             # Report error
             self.transcription_error.emit(error_message)
     
-    def extract_audio(self, video_path, audio_path):
-        """Extract audio from video using ffmpeg"""
+    def transcribe_progressively(self, audio):
+        """
+        Transcribe window by window around the playhead, emitting the segments
+        decoded so far, in playback order, after each window
+        """
+        segments = []
+        for window_segments in iter_transcribe(audio, task=self.task, scheduler=self.scheduler):
+            if not self._running:
+                break
+            if not window_segments:
+                continue
+            # Windows do not overlap, so sorting by start restores playback order
+            segments = sorted(segments + window_segments, key=lambda segment: segment['start'])
+            segments = [dict(segment, id=index) for index, segment in enumerate(segments)]
+            self.mark_stage("first_segments")
+            self.segments_partial.emit(list(segments))
+        return segments
+    
+    def transcribe_draft_then_refine(self, audio):
+        """Emit draft subtitles from a fast model, then replace them as the refine pass progresses"""
+        segments = []
+        refining = False
+        for stage, segments in iter_draft_and_refine(audio, task=self.task):
+            if not self._running:
+                break
+            if stage == "refine" and not refining:
+                refining = True
+                self.transcription_progress.emit("Draft subtitles ready, refining with the selected model...")
+            self.segments_partial.emit(list(segments))
+        return segments
+    
+    def extract_audio(self, video_path):
+        """Start decoding the audio of the video to 16 kHz mono PCM in memory using ffmpeg"""
         try:
             # Print more information for debugging
             print(f"Extracting audio from: {video_path}")
-            print(f"Saving audio to: {audio_path}")
             
-            (
-                ffmpeg
-                .input(video_path)
-                .output(audio_path, acodec='pcm_s16le', ac=1, ar='16k')
-                .run(quiet=True, overwrite_output=True)
-            )
+            audio = StreamingPcm(video_path)
             
-            # Verify the audio file was created
-            if not os.path.exists(audio_path):
-                raise Exception("Audio extraction failed - no output file created")
+            # Verify some audio is being decoded
+            if audio.wait_for(1) == 0:
+                raise Exception("Audio extraction failed - no audio decoded")
                 
-            print(f"Audio extraction complete: {os.path.getsize(audio_path)} bytes")
+            print(f"Audio extraction started: first audio after {audio.timings['first_audio']:.2f}s")
+            return audio
             
         except Exception as e:
             print(f"Error extracting audio: {str(e)}")
-            raise Exception(f"Error extracting audio: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error extracting audio: {str(e)}") 
+
+    def release_audio(self, audio):
+        """
+        Drop the decoded track once transcription is done.
+
+        Word timings and range re-transcription still read the audio, but only
+        a few seconds at a time, so ffmpeg seeks to those ranges instead.
+        """
+        try:
+            length = audio.wait()
+        except Exception as e:
+            print(f"Audio extraction did not finish: {str(e)}")
+            return
+        if self.audio is audio:
+            self.audio = MediaPcm(audio.media_path, length, fingerprint=audio.fingerprint)
+            print(f"Released {length * 2 / (1024 * 1024):.0f} MB of decoded audio")
+
+    def mark_stage(self, name):
+        """Record the first time `name` happens, in seconds since extraction started"""
+        if self.audio is not None and name not in self.stage_timings:
+            self.stage_timings[name] = time.perf_counter() - self.audio.started
+    
+    def report_stage_timings(self):
+        """Print how long extraction and transcription took and how much they overlapped"""
+        audio = self.audio
+        timings = self.stage_timings
+        extraction = audio.timings["extraction"]
+        extraction_end = extraction if extraction is not None else time.perf_counter() - audio.started
+        timings.update(extraction=extraction, first_audio=audio.timings["first_audio"],
+                       extraction_stalled=audio.timings["stalled"],
+                       overlap=max(0.0, min(extraction_end, timings["transcription_end"]) - timings["transcription_start"]))
+        extraction_text = f"{extraction_end:.1f}s" + ("" if extraction is not None else " (still running)")
+        transcription_text = f"{timings['transcription_start']:.1f}s-{timings['transcription_end']:.1f}s"
+        if timings.get("first_segments") is not None:
+            transcription_text += f" (first subtitles at {timings['first_segments']:.1f}s)"
+        print(f"Stage timings: extraction {extraction_text}, first audio after {timings['first_audio']:.2f}s, "
+              f"paused {timings['extraction_stalled']:.1f}s by back-pressure; transcription {transcription_text}; "
+              f"overlap {timings['overlap']:.1f}s")
+
+class WordTimingWorker(QObject):
+    """
+    Computes word-level timestamps for requested segments on its own thread.
+    
+    Alignment requests for the segments near the playhead are handled here, so
+    neither the UI nor the running transcription waits for them.
+    """
+    # Signals
+    words_ready = pyqtSignal(dict, list)  # segment, word timings
+    
+    def __init__(self):
+        super().__init__()
+        self.aligner = None
+        self.media_path = None
+        
+    @pyqtSlot(str, object, list)
+    def align_segments(self, media_path, audio, segments):
+        """Align each segment that has no cached word timings yet, emitting the result"""
+        from core.alignment import WordAligner
+        
+        if self.aligner is None or media_path != self.media_path:
+            self.aligner = WordAligner(audio)
+            self.media_path = media_path
+        else:
+            # The same media, possibly no longer held in memory
+            self.aligner.audio_path = audio
+        
+        for segment in segments:
+            try:
+                words = self.aligner.words(segment)
+            except Exception as e:
+                print(f"Word alignment failed for segment at {segment.get('start', 0):.1f}s: {e}")
+                words = []
+            self.words_ready.emit(segment, words)
+
+class RangeTranscriptionWorker(QObject):
+    """
+    Re-transcribes a selected time range on its own thread.
+    
+    The main transcription worker may still be decoding the rest of the file, so
+    range requests get a separate thread and the two share the loaded models.
+    """
+    # Signals
+    range_complete = pyqtSignal(float, float, list)  # start, end, segments of that range
+    range_error = pyqtSignal(str)
+    
+    @pyqtSlot(object, float, float, dict)
+    def transcribe_range(self, audio, start_seconds, end_seconds, settings):
+        """Decode [start_seconds, end_seconds] with `settings` (model_size, language, prompt, task)"""
+        from core.transcriber import transcribe_range
+        
+        try:
+            segments = transcribe_range(audio, start_seconds, end_seconds,
+                                        model_size=settings.get("model_size"),
+                                        language=settings.get("language"),
+                                        prompt=settings.get("prompt"),
+                                        task=settings.get("task", "transcribe"))
+            self.range_complete.emit(start_seconds, end_seconds, segments)
+        except Exception as e:
+            traceback.print_exc()
+            self.range_error.emit(f"Re-transcription failed: {str(e)}")
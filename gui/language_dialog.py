@@ -4,6 +4,13 @@ from PyQt5.QtCore import Qt
 import os
 import json
 
+try:
+    from core.transcriber import is_whisper_translation_enabled
+except ImportError:
+    # Without core the worker falls back to a dummy that never translates
+    def is_whisper_translation_enabled():
+        return False
+
 class LanguageSelectionDialog(QDialog):
     """Dialog for selecting subtitle language"""
     
@@ -140,9 +147,13 @@ class LanguageSelectionDialog(QDialog):
         except Exception as e:
             print(f"WARNING: Failed to clear cached API key: {e}")
     
+    def uses_whisper_translation(self):
+        """English subtitles are produced locally by Whisper when WHISPER_TRANSLATE is enabled"""
+        return self.english_radio.isChecked() and is_whisper_translation_enabled()
+    
     def on_language_selected(self):
         """Enable/disable API key input based on language selection"""
-        if self.auto_radio.isChecked():
+        if self.auto_radio.isChecked() or self.uses_whisper_translation():
             self.api_group.setEnabled(False)
         else:
             self.api_group.setEnabled(True)
@@ -152,6 +163,10 @@ class LanguageSelectionDialog(QDialog):
         if self.auto_radio.isChecked():
             self.selected_language = "auto"
             self.accept()
+        elif self.uses_whisper_translation():
+            # No API key needed, Whisper translates to English locally
+            self.selected_language = "english"
+            self.accept()
         else:
             # Check if API key is provided for translation
             api_key = self.api_key_input.text().strip()
@@ -1,6 +1,7 @@
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from gui.video_player import VideoPlayer
 import sys
+import os
 
 # Import our cleanup module if available
 try:
@@ -38,6 +39,14 @@ def launch_app():
     window = MainWindow()
     window.show()
     
+    # Load the Whisper model while the user picks a language and a video
+    if os.environ.get("WHISPER_PRELOAD", "1") != "0":
+        try:
+            from core.transcriber import preload_model
+            preload_model()
+        except ImportError as e:
+            print(f"WARNING: Could not preload model: {e}")
+    
     # Make sure cleanup is called when the application exits
     app.aboutToQuit.connect(cleanup)
     
@@ -0,0 +1,87 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QDoubleSpinBox,
+                             QComboBox, QPushButton, QLineEdit, QMessageBox)
+import os
+
+class RangeTranscriptionDialog(QDialog):
+    """Dialog for re-transcribing a time range with different settings"""
+
+    MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+
+    def __init__(self, start_seconds, end_seconds, duration, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Re-transcribe Range")
+        self.resize(400, 220)
+        self.duration = max(duration, end_seconds)
+
+        self.init_ui(start_seconds, end_seconds)
+
+    def init_ui(self, start_seconds, end_seconds):
+        layout = QVBoxLayout()
+        form = QFormLayout()
+
+        # Khoảng thời gian cần nhận dạng lại, tính bằng giây
+        self.start_input = QDoubleSpinBox()
+        self.start_input.setRange(0.0, self.duration)
+        self.start_input.setDecimals(1)
+        self.start_input.setSuffix(" s")
+        self.start_input.setValue(start_seconds)
+        form.addRow("Start:", self.start_input)
+
+        self.end_input = QDoubleSpinBox()
+        self.end_input.setRange(0.0, self.duration)
+        self.end_input.setDecimals(1)
+        self.end_input.setSuffix(" s")
+        self.end_input.setValue(end_seconds)
+        form.addRow("End:", self.end_input)
+
+        self.model_input = QComboBox()
+        self.model_input.addItems(self.MODEL_SIZES)
+        model_size = os.environ.get("WHISPER_MODEL_SIZE", "small")
+        if model_size in self.MODEL_SIZES:
+            self.model_input.setCurrentText(model_size)
+        form.addRow("Model size:", self.model_input)
+
+        self.language_input = QLineEdit()
+        self.language_input.setPlaceholderText("Auto-detect on this range (e.g. en, vi, ja)")
+        form.addRow("Language:", self.language_input)
+
+        self.prompt_input = QLineEdit()
+        self.prompt_input.setPlaceholderText("Optional names, terms or preceding text")
+        form.addRow("Prompt:", self.prompt_input)
+
+        layout.addLayout(form)
+
+        hint = QLabel("Only this range is decoded; its subtitles are replaced by the new ones.")
+        hint.setStyleSheet("color: gray; font-size: 10px;")
+        hint.setWordWrap(True)
+        layout.addWidget(hint)
+
+        # Buttons
+        button_layout = QHBoxLayout()
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.reject)
+        self.ok_btn = QPushButton("Re-transcribe")
+        self.ok_btn.clicked.connect(self.on_ok_clicked)
+
+        button_layout.addWidget(self.cancel_btn)
+        button_layout.addWidget(self.ok_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+    def on_ok_clicked(self):
+        """Validate the range and accept the dialog"""
+        if self.end_input.value() <= self.start_input.value():
+            QMessageBox.warning(self, "Invalid Range", "The end of the range must be after its start.")
+            return
+        self.accept()
+
+    def get_selection(self):
+        """Return the selected range and decode settings"""
+        return {
+            "start": self.start_input.value(),
+            "end": self.end_input.value(),
+            "model_size": self.model_input.currentText(),
+            "language": self.language_input.text().strip() or None,
+            "prompt": self.prompt_input.text().strip() or None,
+        }
@@ -12,11 +12,14 @@ import tempfile
 import shutil
 import qtawesome as qta
 from gui.language_dialog import LanguageSelectionDialog
+from gui.range_dialog import RangeTranscriptionDialog
 
 # --- Giả lập core nếu không tìm thấy ---
 try:
-    from core.transcriber import transcribe
-    from core.worker import TranscriptionWorker
+    from core.transcriber import transcribe, get_preload_state, task_for_target, range_bounds, splice_segments
+    from core.worker import TranscriptionWorker, WordTimingWorker, RangeTranscriptionWorker
+    from core.alignment import WordAligner
+    from core.qos import get_governor
     from core.translator import GeminiTranslator
     print("INFO: Using actual 'core' module.")
 except ImportError as e:
@@ -26,6 +29,7 @@ except ImportError as e:
     class TranscriptionWorker(QThread):
         transcription_progress = pyqtSignal(str)
         transcription_complete = pyqtSignal(list)
+        segments_partial = pyqtSignal(list)
         transcription_error = pyqtSignal(str)
 
         def __init__(self, parent=None):
@@ -60,6 +64,17 @@ except ImportError as e:
         print(f"Dummy transcribe called: Path={audio_path}, Temp={temp_dir}")
         return []
 
+    def get_preload_state():
+        return {"state": "ready", "model_size": None, "error": None}
+
+    def task_for_target(target_language):
+        return "transcribe"
+
+    WordTimingWorker = None
+    RangeTranscriptionWorker = None
+    WordAligner = None
+    get_governor = None
+
 class PlayPauseOverlay(QWidget):
     """Overlay widget for play/pause animation"""
     
@@ -141,10 +156,17 @@ class VideoFrame(QFrame):
 class VideoPlayer(QWidget):
     process_video_signal = pyqtSignal(str)
     translate_segments_signal = pyqtSignal(list, str)
+    align_segments_signal = pyqtSignal(str, object, list)
+    transcribe_range_signal = pyqtSignal(object, float, float, dict)
     SUBTITLE_LR_MARGIN = 20
     SUBTITLE_BOTTOM_MARGIN = 20
     SUBTITLE_FONT_SIZE = 18
     SUBTITLE_TIMER_INTERVAL = 50 # ms
+    PARTIAL_SUBTITLE_MIN_INTERVAL = 3.0 # seconds before the first reload of partial subtitles
+    PARTIAL_SUBTITLE_MAX_INTERVAL = 30.0 # the wait doubles after every reload up to this
+    WORD_TIMING_LOOKBEHIND = 2.0 # seconds before the playhead to align words for
+    WORD_TIMING_LOOKAHEAD = 20.0 # seconds after the playhead to align words for
+    RANGE_DEFAULT_HALF_WIDTH = 15.0 # seconds around the playhead offered for re-transcription
 
     def __init__(self):
         super().__init__()
@@ -158,6 +180,13 @@ class VideoPlayer(QWidget):
         self.gemini_api_key = ""
         self.original_segments = []
         self.temp_dir = tempfile.mkdtemp()
+        self.last_partial_load_time = 0.0
+        self.partial_subtitle_interval = self.PARTIAL_SUBTITLE_MIN_INTERVAL
+        self.pending_partial_segments = None
+        self.segments_translated = False
+        self.word_timings = {}  # segment key -> word timings
+        self.word_timing_requested = set()
+        self.pending_range = None  # (start, end) of a re-transcribed range awaiting translation
         
         # Create VLC instance with plugin options
         vlc_options = [
@@ -267,6 +296,9 @@ class VideoPlayer(QWidget):
         self.position_slider.mousePressEvent = self.handle_slider_click
         self.duration_label = QLabel("00:00 / 00:00")
         self.duration_label.setFixedWidth(100)
+        # Shows whether the Whisper model preloaded at startup is ready
+        self.model_status_label = QLabel("")
+        self.model_status_label.setStyleSheet("color: #a0a0a0; font-size: 10px;")
         self.save_subtitle_btn = QPushButton("Save Subtitles")
         raw = qta.icon('fa5s.save', color='white')
         pix = raw.pixmap(QSize(int(self.icon_size.width()*self._dpr), int(self.icon_size.height()*self._dpr)))
@@ -344,6 +376,9 @@ class VideoPlayer(QWidget):
         open_action.triggered.connect(self.open_video_dialog)
         save_action = self.options_menu.addAction("Save Subtitles")
         save_action.triggered.connect(self.save_subtitles)
+        self.range_action = self.options_menu.addAction("Re-transcribe Range...")
+        self.range_action.triggered.connect(self.open_range_dialog)
+        self.range_action.setEnabled(RangeTranscriptionWorker is not None)
         
         # Add separator
         self.options_menu.addSeparator()
@@ -361,6 +396,7 @@ class VideoPlayer(QWidget):
         self.controls_layout.addWidget(self.play_pause_icon)
         self.controls_layout.addWidget(self.position_slider, 1)
         self.controls_layout.addWidget(self.duration_label)
+        self.controls_layout.addWidget(self.model_status_label)
         self.controls_layout.addWidget(self.volume_icon)
         self.controls_layout.addWidget(self.volume_slider)
         self.controls_layout.addWidget(self.fullscreen_icon)
@@ -397,6 +433,17 @@ class VideoPlayer(QWidget):
         self.timer.setInterval(200)
         self.timer.timeout.connect(self.update_ui)
 
+        # Single-shot timer that loads the latest partial subtitles
+        self.partial_subtitle_timer = QTimer(self)
+        self.partial_subtitle_timer.setSingleShot(True)
+        self.partial_subtitle_timer.timeout.connect(self.flush_partial_subtitles)
+
+        # Timer for polling the background model preload
+        self.model_status_timer = QTimer(self)
+        self.model_status_timer.setInterval(500)
+        self.model_status_timer.timeout.connect(self.update_model_status)
+        self.model_status_timer.start()
+
         self.setup_worker_thread()
         self.open_btn.clicked.connect(self.open_video_dialog)
 
@@ -407,6 +454,7 @@ class VideoPlayer(QWidget):
         self.transcription_worker.moveToThread(self.worker_thread)
         self.transcription_worker.transcription_progress.connect(self.on_transcription_progress)
         self.transcription_worker.transcription_complete.connect(self.on_transcription_complete)
+        self.transcription_worker.segments_partial.connect(self.on_segments_partial)
         self.transcription_worker.transcription_error.connect(self.on_transcription_error)
         self.process_video_signal.connect(self.transcription_worker.process_video)
         self.worker_thread.finished.connect(self.worker_thread.deleteLater)
@@ -417,6 +465,44 @@ class VideoPlayer(QWidget):
         self.translation_thread = QThread()
         self.translator = None  # Will be created when needed with the API key
 
+        # Word timings are aligned lazily near the playhead on their own thread
+        self.word_timing_worker = None
+        if WordTimingWorker is not None and os.environ.get("WHISPER_WORD_TIMINGS", "0") == "1":
+            self.word_timing_thread = QThread()
+            self.word_timing_worker = WordTimingWorker()
+            self.word_timing_worker.moveToThread(self.word_timing_thread)
+            self.word_timing_worker.words_ready.connect(self.on_words_ready)
+            self.align_segments_signal.connect(self.word_timing_worker.align_segments)
+            self.word_timing_thread.start()
+            print("INFO: Word timing thread started.")
+
+        # Selected ranges are re-transcribed while the main transcription may still run
+        self.range_worker = None
+        if RangeTranscriptionWorker is not None:
+            self.range_thread = QThread()
+            self.range_worker = RangeTranscriptionWorker()
+            self.range_worker.moveToThread(self.range_thread)
+            self.range_worker.range_complete.connect(self.on_range_transcribed)
+            self.range_worker.range_error.connect(self.on_range_error)
+            self.transcribe_range_signal.connect(self.range_worker.transcribe_range)
+            self.range_thread.start()
+            print("INFO: Range transcription thread started.")
+
+    def update_model_status(self):
+        """Show the state of the background model preload."""
+        preload = get_preload_state()
+        state = preload.get("state")
+        model_name = f"Model {preload['model_size']}" if preload.get("model_size") else "Model"
+        if state == "loading":
+            self.model_status_label.setText(f"{model_name} loading...")
+        elif state == "ready":
+            self.model_status_label.setText(f"{model_name} ready")
+            self.model_status_timer.stop()
+        elif state == "error":
+            self.model_status_label.setText("Model load failed")
+            self.model_status_label.setToolTip(preload.get("error") or "")
+            self.model_status_timer.stop()
+
     def open_video_dialog(self):
         """Show language selection dialog before opening video."""
         # Show language selection dialog
@@ -499,6 +585,14 @@ class VideoPlayer(QWidget):
             self.segments = []
             self.current_segment_index = -1
             self.next_segment_index = 0
+            self.cancel_partial_subtitles()
+            self.last_partial_load_time = 0.0
+            self.partial_subtitle_interval = self.PARTIAL_SUBTITLE_MIN_INTERVAL
+            self.original_segments = []
+            self.segments_translated = False
+            self.word_timings = {}
+            self.word_timing_requested = set()
+            self.pending_range = None
             self.save_subtitle_btn.setEnabled(False)
             self.play_pause_icon.setEnabled(True)
             # Set slider range to video duration in ms
@@ -516,7 +610,11 @@ class VideoPlayer(QWidget):
 
             # Start transcription
             self.progress_bar.setVisible(True)
-            print("INFO: Emitting process_video_signal")
+            # English subtitles can come straight out of Whisper's translate task
+            self.transcription_worker.task = task_for_target(self.selected_language)
+            if hasattr(self.transcription_worker, 'update_playhead'):
+                self.transcription_worker.update_playhead(0.0)
+            print(f"INFO: Emitting process_video_signal (task: {self.transcription_worker.task})")
             self.process_video_signal.emit(video_path)
             
             # Trigger UI update after a short delay to allow media parsing
@@ -533,14 +631,69 @@ class VideoPlayer(QWidget):
         """Cập nhật thông báo tiến trình gỡ băng."""
         print(f"INFO: Transcription Progress: {message}")
 
+    def on_segments_partial(self, segments):
+        """Show subtitles for the part of the media transcribed so far."""
+        # Chỉ giữ bản mới nhất; bộ hẹn giờ sẽ nạp nó khi hết thời gian chờ
+        self.pending_partial_segments = segments
+        if self.partial_subtitle_timer.isActive():
+            return
+        wait = self.partial_subtitle_interval - (time.time() - self.last_partial_load_time)
+        self.partial_subtitle_timer.start(max(0, int(wait * 1000)))
+
+    def flush_partial_subtitles(self):
+        """Load the latest partial segments received since the last reload."""
+        segments = self.pending_partial_segments
+        self.pending_partial_segments = None
+        if segments is None:
+            return
+        self.last_partial_load_time = time.time()
+        # libvlc cannot remove a subtitle slave, so every reload leaves a track
+        # behind; back off to keep their number small on long media
+        self.partial_subtitle_interval = min(self.partial_subtitle_interval * 2, self.PARTIAL_SUBTITLE_MAX_INTERVAL)
+        
+        print(f"INFO: Partial transcription: {len(segments)} segments so far.")
+        self.segments = segments
+        self.current_segment_index = -1
+        self.next_segment_index = 0
+        
+        try:
+            self.load_subtitle_track("subtitles_partial.srt")
+        except Exception as e:
+            print(f"WARNING: Failed to load partial subtitles: {e}")
+
+    def cancel_partial_subtitles(self):
+        """Drop partial subtitles that are waiting to be loaded."""
+        self.partial_subtitle_timer.stop()
+        self.pending_partial_segments = None
+
+    def load_subtitle_track(self, filename):
+        """
+        Write the current segments to `filename` in the temp dir and load it into VLC.
+
+        The file is replaced rather than rewritten, so VLC can keep reading the
+        previous version it still has open, and one path is reused across reloads.
+        """
+        self.subtitle_path = os.path.join(self.temp_dir, filename)
+        temp_path = self.subtitle_path + ".tmp"
+        self.save_as_srt(temp_path)
+        os.replace(temp_path, self.subtitle_path)
+        subtitle_uri = QUrl.fromLocalFile(os.path.abspath(self.subtitle_path)).toString()
+        self.mediaplayer.add_slave(vlc.MediaSlaveType.subtitle, subtitle_uri, True)
+        QTimer.singleShot(200, self.check_and_enable_subtitles)
+
     def on_transcription_complete(self, segments):
         """Handle transcription completion."""
         print(f"INFO: Transcription Complete. Received {len(segments)} segments.")
+        self.cancel_partial_subtitles()
         # Store original segments
         self.original_segments = segments.copy() if segments else []
         
-        # If a specific language is selected, translate the segments
-        if self.selected_language != "auto" and self.original_segments:
+        # If a specific language is selected, translate the segments,
+        # unless Whisper already produced them in that language
+        whisper_translated = getattr(self.transcription_worker, "task", "transcribe") == "translate"
+        if whisper_translated:
+            print("INFO: Whisper translated the audio to English, skipping Gemini translation")
+        if self.selected_language != "auto" and self.original_segments and not whisper_translated:
             self.translate_subtitles(self.original_segments, self.selected_language)
         else:
             # Use original segments directly
@@ -575,6 +728,7 @@ class VideoPlayer(QWidget):
     def on_transcription_error(self, error_message):
         """Xử lý khi có lỗi trong quá trình gỡ băng."""
         print(f"ERROR: Transcription Error: {error_message}")
+        self.cancel_partial_subtitles()
         self.progress_bar.setVisible(False)
         QMessageBox.critical(self, "Transcription Error", f"Failed to transcribe audio:\n{error_message}")
 
@@ -592,13 +746,14 @@ class VideoPlayer(QWidget):
                 # Find the index of our added subtitle (often index 1)
                 # The description tuple might look like: [(0, b'Disable'), (1, b'Track 1 - [SubRip]')] 
                 # or similar, depending on VLC version and OS.
-                # We want the first non-disable track.
+                # We want the most recently added non-disable track, since partial
+                # subtitles are replaced by adding a newer track.
                 track_id_to_enable = -1
                 for track_id, track_name_bytes in spu_desc:
-                    if track_id != 0: # Skip the 'Disable' track
+                    if track_id > 0: # Skip the 'Disable' track
                         track_id_to_enable = track_id
-                        print(f"INFO: Found subtitle track ID {track_id} to enable.")
-                        break
+                if track_id_to_enable != -1:
+                    print(f"INFO: Found subtitle track ID {track_id_to_enable} to enable.")
                 
                 if track_id_to_enable != -1:
                     result = self.mediaplayer.video_set_spu(track_id_to_enable)
@@ -661,6 +816,11 @@ class VideoPlayer(QWidget):
             result = self.mediaplayer.set_time(position)
             if result == -1:
                 print(f"WARNING: Seeking to position {position} failed")
+            else:
+                # Transcribe the region being jumped to first
+                if hasattr(self.transcription_worker, 'update_playhead'):
+                    self.transcription_worker.update_playhead(position / 1000.0, seek=True)
+                self.request_word_timings(position / 1000.0)
         except Exception as e:
             print(f"ERROR: Failed to seek to position {position}: {e}")
 
@@ -704,11 +864,129 @@ class VideoPlayer(QWidget):
 
         # Update play/pause icon based on playing state
         self.update_play_pause_icon(self.mediaplayer.is_playing())
+        self.request_word_timings(position / 1000.0)
+        if position >= 0 and hasattr(self.transcription_worker, 'update_playhead'):
+            self.transcription_worker.update_playhead(position / 1000.0)
+        self.update_cpu_allocation()
 
         # Stop timer if playback paused or ended
         if not self.mediaplayer.is_playing():
             self.timer.stop()
 
+    def update_cpu_allocation(self):
+        """Keep cores for playback while playing and report dropped frames to the governor."""
+        if get_governor is None:
+            return
+        governor = get_governor()
+        media = self.mediaplayer.get_media()
+        if media is not None:
+            stats = vlc.MediaStats()
+            if media.get_stats(stats):
+                governor.record_frames(stats.displayed_pictures, stats.lost_pictures)
+        governor.set_playing(bool(self.mediaplayer.is_playing()))
+
+    def request_word_timings(self, playhead):
+        """Queue word alignment for the segments around the playhead that have none yet."""
+        if self.word_timing_worker is None or not self.segments or playhead < 0:
+            return
+        audio = getattr(self.transcription_worker, "audio", None)
+        # Words can only be aligned to text in the spoken language
+        if audio is None or self.segments_translated or self.transcription_worker.task == "translate":
+            return
+        
+        pending = []
+        for segment in self.segments:
+            if segment.get('start', 0) > playhead + self.WORD_TIMING_LOOKAHEAD:
+                break
+            if segment.get('end', 0) < playhead - self.WORD_TIMING_LOOKBEHIND:
+                continue
+            key = WordAligner.segment_key(segment)
+            if key in self.word_timing_requested:
+                continue
+            self.word_timing_requested.add(key)
+            pending.append(dict(segment))
+        if pending:
+            self.align_segments_signal.emit(self.video_path, audio, pending)
+
+    def on_words_ready(self, segment, words):
+        """Attach aligned word timings to the matching segment."""
+        key = WordAligner.segment_key(segment)
+        if key not in self.word_timing_requested:
+            return  # A request for a previous video
+        self.word_timings[key] = words
+        for current in self.segments:
+            if WordAligner.segment_key(current) == key:
+                current['words'] = words
+                break
+
+    def open_range_dialog(self):
+        """Ask for a time range and settings, then re-transcribe only that range."""
+        audio = getattr(self.transcription_worker, "audio", None)
+        if self.range_worker is None or audio is None:
+            QMessageBox.warning(self, "No Audio", "Load a video before re-transcribing part of it.")
+            return
+        if not self.original_segments:
+            QMessageBox.information(self, "Transcription Running",
+                                    "Wait for the transcription to finish before re-transcribing a range.")
+            return
+
+        # Mặc định: phụ đề đang hiển thị, hoặc một đoạn quanh vị trí phát
+        playhead = max(0.0, self.mediaplayer.get_time() / 1000.0)
+        duration = max(0.0, self.mediaplayer.get_length() / 1000.0)
+        start = max(0.0, playhead - self.RANGE_DEFAULT_HALF_WIDTH)
+        end = playhead + self.RANGE_DEFAULT_HALF_WIDTH
+        for segment in self.segments:
+            if segment.get('start', 0) <= playhead < segment.get('end', 0):
+                start, end = segment.get('start', 0), segment.get('end', 0)
+                break
+        if duration > 0:
+            end = min(end, duration)
+
+        dialog = RangeTranscriptionDialog(start, end, duration, self)
+        if dialog.exec_() != RangeTranscriptionDialog.Accepted:
+            return
+        settings = dialog.get_selection()
+        # Whole subtitles are replaced, so the range grows to the ones it cuts through
+        start, end = range_bounds(self.original_segments, settings.pop("start"), settings.pop("end"))
+        settings["task"] = self.transcription_worker.task
+        print(f"INFO: Re-transcribing {start:.1f}s-{end:.1f}s with {settings}")
+        self.range_action.setEnabled(False)
+        self.transcribe_range_signal.emit(audio, start, end, settings)
+
+    def on_range_transcribed(self, start, end, segments):
+        """Splice the re-transcribed range into the subtitles."""
+        print(f"INFO: Range {start:.1f}s-{end:.1f}s re-transcribed: {len(segments)} segments.")
+        self.range_action.setEnabled(True)
+        self.original_segments = splice_segments(self.original_segments, segments, start, end)
+        if self.segments_translated and segments:
+            # Only the new subtitles need translating; they are spliced in on completion
+            self.pending_range = (start, end)
+            self.translate_subtitles(segments, self.selected_language)
+            return
+        if self.segments_translated:
+            self.show_spliced_segments(splice_segments(self.segments, [], start, end))
+        else:
+            self.show_spliced_segments(self.original_segments)
+
+    def on_range_error(self, error_message):
+        """Report a failed range re-transcription, keeping the current subtitles."""
+        print(f"ERROR: {error_message}")
+        self.range_action.setEnabled(True)
+        QMessageBox.warning(self, "Re-transcription Error", error_message)
+
+    def show_spliced_segments(self, segments):
+        """Replace the displayed subtitles after part of them changed."""
+        self.segments = segments
+        self.current_segment_index = -1
+        self.next_segment_index = 0
+        self.save_subtitle_btn.setEnabled(bool(self.segments))
+        self.progress_bar.setVisible(False)
+
+        try:
+            self.load_subtitle_track("subtitles_range.srt")
+        except Exception as e:
+            print(f"ERROR: Failed to load subtitles: {e}")
+
     def update_duration_label(self, position, duration):
         """Cập nhật label hiển thị thời gian."""
         if duration <= 0:
@@ -807,6 +1085,10 @@ class VideoPlayer(QWidget):
         """Lưu segments thành tệp JSON."""
         try:
             serializable_segments = [{'start': s.get('start',0), 'end':s.get('end',0), 'text':s.get('text','')} for s in self.segments]
+            for serializable, segment in zip(serializable_segments, self.segments):
+                words = self.word_timings.get(WordAligner.segment_key(segment)) if WordAligner else None
+                if words:
+                    serializable['words'] = words
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(serializable_segments, f, indent=2, ensure_ascii=False)
         except TypeError as e:
@@ -858,6 +1140,14 @@ class VideoPlayer(QWidget):
             self.translation_thread.quit()
             self.translation_thread.wait(1000)
             
+        if hasattr(self, 'word_timing_thread') and self.word_timing_thread.isRunning():
+            self.word_timing_thread.quit()
+            self.word_timing_thread.wait(1000)
+
+        if hasattr(self, 'range_thread') and self.range_thread.isRunning():
+            self.range_thread.quit()
+            self.range_thread.wait(1000)
+            
         # Clean up temp directory
         try:
             if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
@@ -1020,8 +1310,15 @@ class VideoPlayer(QWidget):
         """Handle translation completion."""
         print(f"INFO: Translation complete. Received {len(translated_segments)} segments.")
         
+        if self.pending_range is not None:
+            start, end = self.pending_range
+            self.pending_range = None
+            self.show_spliced_segments(splice_segments(self.segments, translated_segments, start, end))
+            return
+        
         # Use translated segments
         self.segments = translated_segments
+        self.segments_translated = True
         self.current_segment_index = -1
         self.next_segment_index = 0
         self.save_subtitle_btn.setEnabled(bool(self.segments))
@@ -1055,6 +1352,11 @@ class VideoPlayer(QWidget):
         print(f"ERROR: Translation error: {error_message}")
         QMessageBox.critical(self, "Translation Error", f"Failed to translate subtitles:\n{error_message}")
         
+        if self.pending_range is not None:
+            # The rest of the subtitles are still translated; keep them
+            self.pending_range = None
+            return
+        
         # Fall back to original segments
         self.segments = self.original_segments
         self.current_segment_index = -1
@@ -36,6 +36,127 @@ def parse_arguments():
         help="Language code for transcription (default: auto-detect)"
     )
     
+    # Transcription backend
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=["whisper", "ctranslate2"],
+        default="whisper",
+        help="Transcription engine: openai-whisper (PyTorch) or faster-whisper (CTranslate2) (default: whisper)"
+    )
+    
+    # Weight precision for inference
+    parser.add_argument(
+        "--precision",
+        type=str,
+        choices=["fp32", "fp16", "int8"],
+        default=None,
+        help="Model weight precision: fp32, fp16 (GPU only) or int8 for CPU "
+             "(default: fp32 for whisper, int8 for ctranslate2)"
+    )
+    
+    # Number of processes for parallel chunk transcription
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes that transcribe silence-split chunks in parallel (default: 1, sequential)"
+    )
+    
+    # Cores kept free for video playback
+    parser.add_argument(
+        "--playback-cores",
+        type=int,
+        default=None,
+        help="CPU cores kept for video playback while a video plays; transcription uses the rest "
+             "(default: 2, or 1 with fewer than 4 cores)"
+    )
+    
+    # Two-pass draft-then-refine transcription
+    parser.add_argument(
+        "--draft",
+        action="store_true",
+        help="Show draft subtitles from the tiny model first, then refine them with the selected model"
+    )
+    
+    # Voice-activity pre-filter
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Skip non-speech audio before Whisper decoding using a voice-activity filter"
+    )
+    
+    # Local English translation
+    parser.add_argument(
+        "--whisper-translate",
+        action="store_true",
+        help="Produce English subtitles with Whisper's translate task instead of the Gemini API"
+    )
+    
+    # Lazy word-level timestamps
+    parser.add_argument(
+        "--word-timings",
+        action="store_true",
+        help="Align word-level timestamps for the subtitles near the playhead in the background"
+    )
+    
+    # Non-speech window classifier
+    parser.add_argument(
+        "--skip-non-speech",
+        action="store_true",
+        help="Classify each audio window and skip decoding music, noise and silence"
+    )
+    
+    # Bypass cached transcription results
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached transcriptions and re-run Whisper (results are still cached)"
+    )
+    
+    # Memory-mapped model weights
+    parser.add_argument(
+        "--mmap-weights",
+        action="store_true",
+        help="Memory-map CPU model weights so worker processes share one copy"
+    )
+    
+    # Memory budget for the in-process model cache
+    parser.add_argument(
+        "--model-memory-mb",
+        type=float,
+        default=None,
+        help="Memory budget in MB for cached Whisper models; least recently used models are evicted beyond it (default: 4096)"
+    )
+    
+    # Disable background model loading at startup
+    parser.add_argument(
+        "--no-preload",
+        action="store_true",
+        help="Load the Whisper model only when the first video is transcribed"
+    )
+    
+    # Speed/accuracy calibration
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Measure the real-time factor of each model size and decode setting on this host, then exit"
+    )
+    
+    parser.add_argument(
+        "--target-rtf",
+        type=float,
+        default=None,
+        help="Pick the most accurate calibrated configuration whose real-time factor stays below this value"
+    )
+    
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Pick the most accurate calibrated configuration that finishes within this many seconds"
+    )
+    
     # Add a new option to forcibly suppress resource warnings
     parser.add_argument(
         "--no-warnings",
@@ -118,6 +239,64 @@ if __name__ == "__main__":
         os.environ["WHISPER_LANGUAGE"] = args.language
         print(f"Using language: {args.language}")
     
+    os.environ["WHISPER_ENGINE"] = args.engine
+    print(f"Using transcription engine: {args.engine}")
+    
+    precision = args.precision or ("int8" if args.engine == "ctranslate2" else "fp32")
+    os.environ["WHISPER_PRECISION"] = precision
+    print(f"Using model precision: {precision}")
+    
+    if args.workers and args.workers > 1:
+        os.environ["WHISPER_WORKERS"] = str(args.workers)
+        print(f"Using {args.workers} transcription worker processes")
+    
+    if args.playback_cores is not None:
+        os.environ["WHISPER_PLAYBACK_CORES"] = str(args.playback_cores)
+        print(f"Keeping {args.playback_cores} CPU cores for playback")
+    
+    if args.draft:
+        os.environ["WHISPER_DRAFT"] = "1"
+        print("Draft-then-refine transcription enabled")
+    
+    if args.vad:
+        os.environ["WHISPER_VAD"] = "1"
+        print("Voice-activity filter enabled")
+    
+    if args.whisper_translate:
+        os.environ["WHISPER_TRANSLATE"] = "1"
+        print("English subtitles will be translated locally by Whisper")
+    
+    if args.word_timings:
+        os.environ["WHISPER_WORD_TIMINGS"] = "1"
+        print("Lazy word timings enabled")
+    
+    if args.skip_non_speech:
+        os.environ["WHISPER_SKIP_NON_SPEECH"] = "1"
+        print("Non-speech window classifier enabled")
+    
+    if args.no_cache:
+        os.environ["WHISPER_NO_CACHE"] = "1"
+        print("Transcription cache bypassed")
+    
+    if args.mmap_weights:
+        os.environ["WHISPER_MMAP"] = "1"
+        print("Memory-mapped model weights enabled")
+    
+    if args.model_memory_mb is not None:
+        os.environ["WHISPER_MODEL_MEMORY_MB"] = str(args.model_memory_mb)
+        print(f"Model cache memory budget: {args.model_memory_mb} MB")
+    
+    if args.no_preload:
+        os.environ["WHISPER_PRELOAD"] = "0"
+    
+    if args.target_rtf:
+        os.environ["WHISPER_TARGET_RTF"] = str(args.target_rtf)
+        print(f"Target real-time factor: {args.target_rtf}")
+    
+    if args.deadline:
+        os.environ["WHISPER_DEADLINE"] = str(args.deadline)
+        print(f"Transcription deadline: {args.deadline}s")
+    
     # Optionally suppress resource warnings
     if args.no_warnings:
         import warnings
@@ -133,6 +312,11 @@ if __name__ == "__main__":
     if not check_ffmpeg():
         print("Warning: FFmpeg may not be correctly installed.")
         print("Video transcription might not work properly.")
+    
+    if args.calibrate:
+        from core.calibration import calibrate
+        calibrate()
+        sys.exit(0)
         
     try:
         # Now import and launch the app
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import wave
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.audio import (PcmAudio, StreamingPcm, PcmDigest, SAMPLE_RATE, find_wav_silence_splits,
+                        iter_stream_silence_splits, fingerprint_wav, load_wav_pcm)
+
+def bursts(seconds, seed=0):
+    """Noise bursts of random length separated by quiet gaps, as int16 samples"""
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 30, int(seconds * SAMPLE_RATE))
+    position = 0.0
+    while position < seconds:
+        length = rng.uniform(0.5, 3.0)
+        start, end = int(position * SAMPLE_RATE), int((position + length) * SAMPLE_RATE)
+        samples[start:end] += rng.normal(0, 3000, len(samples[start:end]))
+        position += length + rng.uniform(0.2, 1.0)
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+class FeedingPcm(StreamingPcm):
+    """
+    A `StreamingPcm` fed from an array by a thread instead of ffmpeg.
+
+    The feeder follows the same back-pressure rule as the ffmpeg reader, so the
+    inherited `request`, `wait_for` and `read` behave as they do on real media.
+    """
+
+    def __init__(self, samples, media_key="test-media", chunk_samples=SAMPLE_RATE, max_ahead_samples=10 * SAMPLE_RATE):
+        self.media_path = None
+        self.sample_rate = SAMPLE_RATE
+        self.fingerprint = None
+        self.known_fingerprint = None
+        self.media_key = media_key
+        self.max_ahead = max_ahead_samples
+        self._source = samples
+        self._chunk = chunk_samples
+        self._buffer = np.zeros(len(samples), dtype='<i2')
+        self._available = 0
+        self._demand = 0
+        self._closed = False
+        self.complete = False
+        self.error = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._feed, daemon=True).start()
+
+    def _feed(self):
+        with self._cond:
+            while not self.complete:
+                while self._available >= self._demand + self.max_ahead and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                end = min(self._available + self._chunk, len(self._source))
+                self._buffer[self._available:end] = self._source[self._available:end]
+                self._available = end
+                self.complete = end == len(self._source)
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class StreamSplitsTest(unittest.TestCase):
+    """Windows cut while audio arrives line up with those cut on the complete audio"""
+
+    def test_stream_cuts_match_full_split(self):
+        samples = bursts(95)
+        for target, search in ((10.0, 2.5), (30.0, 5.0), (60.0, 10.0)):
+            with self.subTest(target_chunk_seconds=target):
+                expected = find_wav_silence_splits(PcmAudio(samples), target_chunk_seconds=target, search_seconds=search)
+                streamed = list(iter_stream_silence_splits(FeedingPcm(samples), target_chunk_seconds=target,
+                                                           search_seconds=search))
+                self.assertEqual(streamed, expected)
+                self.assertEqual(streamed[-1][1], len(samples))
+
+    def test_audio_shorter_than_a_window(self):
+        samples = bursts(4)
+        self.assertEqual(list(iter_stream_silence_splits(FeedingPcm(samples), target_chunk_seconds=10.0,
+                                                         search_seconds=2.5)),
+                         [(0, len(samples))])
+
+class StreamingPcmTest(unittest.TestCase):
+    """Reads and back-pressure of a stream that is still arriving"""
+
+    def test_reader_stays_within_max_ahead_of_demand(self):
+        samples = bursts(60)
+        audio = FeedingPcm(samples, max_ahead_samples=5 * SAMPLE_RATE)
+        time.sleep(0.1)
+        self.assertEqual(audio.available, 5 * SAMPLE_RATE)
+
+        np.testing.assert_array_equal(audio.read(20 * SAMPLE_RATE, 21 * SAMPLE_RATE),
+                                      samples[20 * SAMPLE_RATE:21 * SAMPLE_RATE])
+        time.sleep(0.1)
+        self.assertEqual(audio.available, 26 * SAMPLE_RATE)
+
+        audio.request(float("inf"))
+        self.assertEqual(audio.wait(), len(samples))
+        np.testing.assert_array_equal(audio.samples, samples)
+
+class FingerprintTest(unittest.TestCase):
+    """The PCM fingerprint is the same however the samples are held or hashed"""
+
+    def test_pcm_fingerprint_matches_wav_file(self):
+        samples = bursts(12)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "audio.wav")
+            with wave.open(path, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(samples.tobytes())
+            np.testing.assert_array_equal(load_wav_pcm(path), load_wav_pcm(PcmAudio(samples)))
+            self.assertEqual(fingerprint_wav(PcmAudio(samples)), fingerprint_wav(path))
+            self.assertEqual(fingerprint_wav(FeedingPcm(samples, max_ahead_samples=float("inf"))), fingerprint_wav(path))
+
+    def test_digest_grows_with_prefix(self):
+        samples = bursts(12)
+        whole = PcmDigest(PcmAudio(samples), block_samples=SAMPLE_RATE)
+        whole.update(7 * SAMPLE_RATE)
+        grown = PcmDigest(PcmAudio(samples), block_samples=SAMPLE_RATE)
+        for end in (1000, 3 * SAMPLE_RATE + 17, 3 * SAMPLE_RATE + 17, 7 * SAMPLE_RATE):
+            grown.update(end)
+        self.assertEqual(grown.hexdigest(), whole.hexdigest())
+
+        other = samples.copy()
+        other[5 * SAMPLE_RATE] += 1
+        changed = PcmDigest(PcmAudio(other))
+        changed.update(7 * SAMPLE_RATE)
+        self.assertNotEqual(changed.hexdigest(), whole.hexdigest())
+
+if __name__ == '__main__':
+    unittest.main()
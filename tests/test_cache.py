@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache import TranscriptionCheckpoint, TranscriptCache, media_key
+
+SETTINGS = {"model_size": "small", "language": "en", "window_seconds": 30.0}
+SEGMENTS = [{"id": 0, "start": 0.0, "end": 2.5, "text": "Xin chào"}]
+
+class CheckpointTest(unittest.TestCase):
+    """TranscriptionCheckpoint only resumes progress made with the same media and settings"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def checkpoint(self, fingerprint="media:abc", settings=SETTINGS):
+        return TranscriptionCheckpoint(fingerprint, settings, directory=self.directory.name)
+
+    def test_save_and_load(self):
+        self.assertIsNone(self.checkpoint().load())
+        self.checkpoint().save(480000, SEGMENTS, prompt="Xin chào", language="vi", audio_digest="0f")
+        state = self.checkpoint().load()
+        self.assertEqual(state["completed_sample"], 480000)
+        self.assertEqual(state["segments"], SEGMENTS)
+        self.assertEqual((state["prompt"], state["language"], state["audio_digest"]), ("Xin chào", "vi", "0f"))
+
+    def test_other_media_or_settings_are_not_resumed(self):
+        self.checkpoint().save(480000, SEGMENTS)
+        self.assertIsNone(self.checkpoint(fingerprint="media:def").load())
+        self.assertIsNone(self.checkpoint(settings=dict(SETTINGS, model_size="tiny")).load())
+
+    def test_unreadable_checkpoint_is_ignored(self):
+        checkpoint = self.checkpoint()
+        with open(checkpoint.path, 'w') as f:
+            f.write("{")
+        self.assertIsNone(checkpoint.load())
+
+    def test_clear(self):
+        checkpoint = self.checkpoint()
+        checkpoint.save(480000, SEGMENTS)
+        checkpoint.clear()
+        checkpoint.clear()
+        self.assertIsNone(checkpoint.load())
+
+class MediaKeyTest(unittest.TestCase):
+    """media_key identifies a file without reading it"""
+
+    def test_key_follows_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "video.mp4")
+            with open(path, 'wb') as f:
+                f.write(b"\0" * 100)
+            key = media_key(path)
+            self.assertEqual(media_key(path), key)
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            self.assertNotEqual(media_key(path), key)
+            with self.assertRaises(OSError):
+                media_key(os.path.join(directory, "missing.mp4"))
+
+class TranscriptCacheTest(unittest.TestCase):
+    """TranscriptCache keeps the most recently used results within its budget"""
+
+    def test_least_recently_used_entries_are_trimmed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = TranscriptCache(directory, max_size_mb=1)
+            self.assertIsNone(cache.get("a"))
+            large = [dict(SEGMENTS[0], text="x" * 300000)]
+            for age, key in enumerate("abc"):
+                cache.put(key, large)
+                os.utime(cache._path(key), (age, age))
+            # A hit makes "a" the most recently used, leaving "b" the oldest
+            self.assertEqual(cache.get("a"), large)
+            cache.put("d", large)
+            self.assertIsNone(cache.get("b"))
+            for key in "acd":
+                self.assertEqual(cache.get(key), large)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.calibration import choose_configuration
+
+def measurement(model_size, config, rtf):
+    return {"model_size": model_size, "config": config, "rtf": rtf, "options": {}}
+
+CALIBRATION = {"measurements": [
+    measurement("tiny", "greedy", 0.02),
+    measurement("small", "greedy", 0.10),
+    measurement("small", "beam_5", 0.25),
+    measurement("medium", "greedy", 0.40),
+    measurement("medium", "beam_3", 0.60),
+    measurement("huge", "greedy", 0.01),  # not a known model size
+]}
+
+class ChooseConfigurationTest(unittest.TestCase):
+    """choose_configuration picks the most accurate calibrated setting within the budget"""
+
+    def choose(self, **budget):
+        choice = choose_configuration(600.0, calibration=CALIBRATION, **budget)
+        return choice["model_size"], choice["config"]
+
+    def test_most_accurate_within_target_rtf(self):
+        self.assertEqual(self.choose(target_rtf=0.3), ("small", "beam_5"))
+        self.assertEqual(self.choose(target_rtf=0.5), ("medium", "greedy"))
+        self.assertEqual(self.choose(target_rtf=1.0), ("medium", "beam_3"))
+
+    def test_deadline_is_spread_over_duration(self):
+        # 90 s for 600 s of media is an RTF of 0.15
+        self.assertEqual(self.choose(deadline=90.0), ("small", "greedy"))
+        self.assertEqual(self.choose(target_rtf=1.0, deadline=90.0), ("small", "greedy"))
+
+    def test_fastest_known_configuration_when_nothing_fits(self):
+        self.assertEqual(self.choose(target_rtf=0.001), ("tiny", "greedy"))
+
+    def test_no_calibration(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(os.environ, {"INTELLIGENCE_SUBTITLE_CACHE_DIR": directory}):
+            self.assertIsNone(choose_configuration(600.0, target_rtf=0.5))
+        self.assertIsNone(choose_configuration(600.0, target_rtf=0.5,
+                                               calibration={"measurements": [measurement("huge", "greedy", 0.01)]}))
+
+if __name__ == '__main__':
+    unittest.main()
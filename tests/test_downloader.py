@@ -0,0 +1,137 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+import unittest
+import http.server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.downloader import ParallelDownloader, DownloadError, download_file
+
+PART_SIZE = 64 * 1024
+DATA = os.urandom(5 * PART_SIZE + 123)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serves DATA with range support, failing or truncating the parts the test asks for"""
+
+    server_version = "RangeStandIn/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get("Range", ""))
+        if not match or not server.supports_ranges:
+            body = DATA
+            self.send_response(200)
+        else:
+            start, end = map(int, match.groups())
+            with server.lock:
+                server.ranges.append(start)
+            index = start // PART_SIZE
+            if start > 0 and index in server.failing:
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = DATA[start:end + 1]
+            if start > 0 and index in server.truncated:
+                # A well-formed response that simply carries fewer bytes than asked for
+                body = body[:len(body) // 2]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class ParallelDownloaderTest(unittest.TestCase):
+    """ParallelDownloader against a local HTTP stand-in for the model host"""
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.supports_ranges = True
+        self.server.failing = set()
+        self.server.truncated = set()
+        self.server.ranges = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/{SHA256}/model.pt"
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.dest_path = os.path.join(self.directory.name, "model.pt")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def downloader(self, expected_sha256=SHA256):
+        return ParallelDownloader(self.url, self.dest_path, expected_sha256=expected_sha256,
+                                  connections=3, part_size=PART_SIZE)
+
+    def completed_parts(self):
+        with open(self.dest_path + ".partial.json", 'r') as f:
+            return set(json.load(f)["completed"])
+
+    def assert_downloaded(self):
+        with open(self.dest_path, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertFalse(os.path.exists(self.dest_path + ".partial"))
+        self.assertFalse(os.path.exists(self.dest_path + ".partial.json"))
+
+    def test_download_verifies_and_moves_into_place(self):
+        progress = []
+        path = download_file(self.url, self.dest_path, expected_sha256=SHA256, connections=3,
+                             progress=lambda downloaded, total: progress.append((downloaded, total)))
+        self.assertEqual(path, self.dest_path)
+        self.assert_downloaded()
+        self.assertEqual(progress[-1], (len(DATA), len(DATA)))
+
+    def test_short_read_part_is_not_marked_complete(self):
+        self.server.truncated = {2}
+        with self.assertRaises(DownloadError):
+            self.downloader().download()
+        self.assertFalse(os.path.exists(self.dest_path))
+        self.assertNotIn(2, self.completed_parts())
+
+        self.server.truncated = set()
+        self.downloader().download()
+        self.assert_downloaded()
+
+    def test_resume_fetches_only_missing_parts(self):
+        self.server.failing = {1, 4}
+        with self.assertRaises(Exception):
+            self.downloader().download()
+        completed = self.completed_parts()
+        self.assertTrue(completed)
+        self.assertFalse({1, 4} & completed)
+
+        self.server.failing = set()
+        self.server.ranges = []
+        self.downloader().download()
+        self.assert_downloaded()
+        # The probe asks for byte 0; every other request is a part missing after the first run
+        fetched = {start // PART_SIZE for start in self.server.ranges if start > 0}
+        self.assertEqual(fetched, {index for index in range(6) if index not in completed} - {0})
+        self.assertEqual(len(self.server.ranges), 1 + len(set(range(6)) - completed))
+
+    def test_sha256_mismatch_removes_partial_download(self):
+        with self.assertRaises(DownloadError):
+            self.downloader(expected_sha256="0" * 64).download()
+        for path in (self.dest_path, self.dest_path + ".partial", self.dest_path + ".partial.json"):
+            self.assertFalse(os.path.exists(path))
+
+    def test_server_without_range_support_falls_back_to_one_stream(self):
+        self.server.supports_ranges = False
+        self.downloader().download()
+        self.assert_downloaded()
+
+if __name__ == '__main__':
+    unittest.main()
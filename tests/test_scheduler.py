@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.scheduler import PlayheadScheduler
+
+def drain(scheduler, windows, after=None):
+    """Indices in the order the scheduler picks them, calling `after(index)` after each"""
+    pending = list(windows)
+    order = []
+    while pending:
+        index = scheduler.next_window(pending)
+        order.append(index)
+        pending = [window for window in pending if window[0] != index]
+        if after is not None:
+            after(index)
+    return order
+
+WINDOWS = [(index, 30.0 * index, 30.0 * (index + 1)) for index in range(6)]
+
+class PlayheadSchedulerTest(unittest.TestCase):
+    """PlayheadScheduler decodes from the playhead forward, then what was skipped"""
+
+    def test_in_order_from_the_start(self):
+        self.assertEqual(drain(PlayheadScheduler(), WINDOWS), [0, 1, 2, 3, 4, 5])
+
+    def test_window_under_playhead_first_then_ahead_then_behind(self):
+        scheduler = PlayheadScheduler()
+        scheduler.set_playhead(95.0, seek=True)
+        self.assertEqual(drain(scheduler, WINDOWS), [3, 4, 5, 0, 1, 2])
+        self.assertEqual(scheduler.seeks, 1)
+
+    def test_seek_reprioritizes_remaining_windows(self):
+        scheduler = PlayheadScheduler()
+
+        def seek_back(index):
+            if index == 1:
+                scheduler.set_playhead(130.0, seek=True)
+            elif index == 5:
+                scheduler.set_playhead(10.0, seek=True)
+        self.assertEqual(drain(scheduler, WINDOWS, after=seek_back), [0, 1, 4, 5, 2, 3])
+
+    def test_playhead_past_every_window(self):
+        scheduler = PlayheadScheduler(playhead=500.0)
+        self.assertEqual(drain(scheduler, WINDOWS[2:]), [2, 3, 4, 5])
+
+    def test_negative_playhead_is_clamped(self):
+        scheduler = PlayheadScheduler()
+        scheduler.set_playhead(-4.0)
+        self.assertEqual(scheduler.playhead, 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import hashlib
+import tempfile
+import importlib.util
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.audio import PcmAudio, SAMPLE_RATE
+from core.scheduler import PlayheadScheduler
+from test_audio import FeedingPcm, bursts
+
+WINDOW_SECONDS = 10.0
+
+class FakeEngine:
+    """Returns one segment per window, named by a hash of its audio, and fails after `fail_after` windows"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.windows = []
+
+    def transcribe(self, model, audio, **options):
+        if self.fail_after is not None and len(self.windows) >= self.fail_after:
+            raise RuntimeError("Interrupted")
+        name = hashlib.sha1(audio.tobytes()).hexdigest()[:8]
+        self.windows.append(name)
+        return {"text": name, "language": "en",
+                "segments": [{"id": 0, "seek": 0, "start": 0.0, "end": len(audio) / SAMPLE_RATE,
+                              "text": name, "temperature": 0.0}]}
+
+@unittest.skipUnless(importlib.util.find_spec("whisper"), "openai-whisper is not installed")
+class SpliceTest(unittest.TestCase):
+    """range_bounds and splice_segments replace whole segments of a range"""
+
+    SEGMENTS = [{"id": index, "start": 4.0 * index, "end": 4.0 * index + 3.0, "text": f"s{index}"}
+                for index in range(5)]
+
+    def test_range_is_widened_to_segments_it_cuts(self):
+        from core.transcriber import range_bounds
+        self.assertEqual(range_bounds(self.SEGMENTS, 5.0, 9.0), (4.0, 11.0))
+        self.assertEqual(range_bounds(self.SEGMENTS, 3.2, 3.8), (3.2, 3.8))
+        self.assertEqual(range_bounds([], 1.0, 2.0), (1.0, 2.0))
+
+    def test_splice_replaces_range_and_renumbers(self):
+        from core.transcriber import splice_segments
+        replacement = [{"id": 0, "start": 4.5, "end": 6.0, "text": "new"},
+                       {"id": 1, "start": 6.0, "end": 10.5, "text": "newer"}]
+        spliced = splice_segments(self.SEGMENTS, replacement, 4.0, 11.0)
+        self.assertEqual([segment["text"] for segment in spliced], ["s0", "new", "newer", "s3", "s4"])
+        self.assertEqual([segment["id"] for segment in spliced], [0, 1, 2, 3, 4])
+        self.assertEqual(spliced[3]["start"], 12.0)
+
+@unittest.skipUnless(importlib.util.find_spec("whisper"), "openai-whisper is not installed")
+class ResumeTest(unittest.TestCase):
+    """iter_transcribe resumes an interrupted job after its last checkpointed window"""
+
+    def setUp(self):
+        from core import transcriber
+
+        self.transcriber = transcriber
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for patch in (mock.patch.dict(os.environ, {"INTELLIGENCE_SUBTITLE_CACHE_DIR": self.directory.name,
+                                                   "WHISPER_MEL_CACHE": "0", "WHISPER_NO_CACHE": "1",
+                                                   "WHISPER_VAD": "0", "WHISPER_SKIP_NON_SPEECH": "0"}),
+                      mock.patch.object(transcriber, "_transcript_cache", None),
+                      mock.patch.object(transcriber, "get_model", return_value=object())):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.samples = bursts(75)
+
+    def transcribe(self, audio, engine, scheduler=None):
+        """Texts of every segment yielded, in playback order"""
+        segments = []
+        with mock.patch("core.engines.get_engine", return_value=engine):
+            for window_segments in self.transcriber.iter_transcribe(audio, language="en", window_seconds=WINDOW_SECONDS,
+                                                                    scheduler=scheduler):
+                segments.extend(window_segments)
+        return [segment["text"] for segment in sorted(segments, key=lambda segment: segment["start"])]
+
+    def interrupt(self, audio, after, scheduler=None):
+        with self.assertRaises(RuntimeError):
+            self.transcribe(audio, FakeEngine(fail_after=after), scheduler)
+
+    def test_resume_decodes_only_remaining_windows(self):
+        reference = self.transcribe(PcmAudio(self.samples), FakeEngine())
+        self.assertGreater(len(reference), 5)
+
+        self.interrupt(PcmAudio(self.samples), after=3)
+        engine = FakeEngine()
+        self.assertEqual(self.transcribe(PcmAudio(self.samples), engine), reference)
+        self.assertEqual(engine.windows, reference[3:])
+
+    def test_streamed_audio_resumes(self):
+        reference = self.transcribe(PcmAudio(self.samples), FakeEngine())
+        for make_scheduler in (lambda: None, PlayheadScheduler):
+            with self.subTest(scheduler=make_scheduler()):
+                self.interrupt(FeedingPcm(self.samples), after=3, scheduler=make_scheduler())
+                engine = FakeEngine()
+                self.assertEqual(self.transcribe(FeedingPcm(self.samples), engine, make_scheduler()), reference)
+                self.assertEqual(engine.windows, reference[3:])
+
+    def test_checkpoint_of_other_audio_is_not_resumed(self):
+        # The same file name, size and modification time, with different audio
+        other = self.samples.copy()
+        other[SAMPLE_RATE:2 * SAMPLE_RATE] = np.flip(other[SAMPLE_RATE:2 * SAMPLE_RATE])
+        reference = self.transcribe(PcmAudio(other), FakeEngine())
+
+        self.interrupt(FeedingPcm(self.samples), after=3)
+        engine = FakeEngine()
+        self.assertEqual(self.transcribe(FeedingPcm(other), engine), reference)
+        self.assertEqual(engine.windows, reference)
+
+if __name__ == '__main__':
+    unittest.main()
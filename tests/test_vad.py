@@ -0,0 +1,160 @@
+import os
+import sys
+import importlib.util
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.audio import SAMPLE_RATE
+from core.vad import classify_window, frame_features
+
+WINDOW_SECONDS = 30
+
+def tone(frequency, seconds, decay=None, vibrato=0.0):
+    """A harmonic note, optionally decaying like a plucked string or with vibrato"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * frequency * t + vibrato * np.sin(2 * np.pi * 5 * t)
+    note = sum(np.sin(k * phase) / k for k in range(1, 7))
+    if decay:
+        note *= np.exp(-t / decay)
+    attack = int(0.01 * SAMPLE_RATE)
+    note[:attack] *= np.linspace(0, 1, attack)
+    return note
+
+def place(buffer, sound, start_seconds):
+    start = int(start_seconds * SAMPLE_RATE)
+    count = min(len(sound), len(buffer) - start)
+    if count > 0:
+        buffer[start:start + count] += sound[:count]
+
+def band(rng):
+    """Chords, a kick drum, hi-hats and a melody"""
+    buffer = np.zeros(WINDOW_SECONDS * SAMPLE_RATE)
+    chords = [[220, 277, 330], [196, 247, 294], [175, 220, 262], [165, 208, 247]]
+    for index, start in enumerate(np.arange(0, WINDOW_SECONDS, 2.0)):
+        for frequency in chords[index % 4]:
+            place(buffer, 0.15 * tone(frequency, 2.0, vibrato=0.3), start)
+    t = np.arange(int(0.15 * SAMPLE_RATE)) / SAMPLE_RATE
+    kick = 0.6 * np.sin(2 * np.pi * (60 + 60 * np.exp(-t * 30)) * t) * np.exp(-t * 20)
+    hat = 0.1 * rng.standard_normal(800) * np.exp(-np.arange(800) / 200)
+    for start in np.arange(0, WINDOW_SECONDS, 0.5):
+        place(buffer, kick, start)
+        place(buffer, hat, start + 0.25)
+    melody = [440, 494, 523, 587, 659, 587, 523, 494]
+    for index, start in enumerate(np.arange(0, WINDOW_SECONDS, 0.25)):
+        place(buffer, 0.2 * tone(melody[index * 3 % 8], 0.25, decay=0.2), start)
+    return buffer
+
+def piano(rng):
+    """Random decaying notes over a bass line"""
+    buffer = np.zeros(WINDOW_SECONDS * SAMPLE_RATE)
+    for start in np.arange(0, WINDOW_SECONDS, 0.4):
+        place(buffer, 0.3 * tone(rng.choice([262, 294, 330, 349, 392, 440, 494, 523]), 1.5, decay=0.4), start)
+    for start in np.arange(0, WINDOW_SECONDS, 1.6):
+        place(buffer, 0.2 * tone(131, 1.6, decay=1.0), start)
+    return buffer
+
+def strings(rng):
+    """Overlapping sustained notes with vibrato"""
+    buffer = np.zeros(WINDOW_SECONDS * SAMPLE_RATE)
+    for start in np.arange(0, WINDOW_SECONDS, 1.0):
+        frequency = rng.choice([196, 220, 247, 262, 294])
+        place(buffer, 0.25 * tone(frequency, 1.2, vibrato=0.8), start)
+        place(buffer, 0.15 * tone(frequency * 1.5, 1.2, vibrato=0.8), start)
+    return buffer
+
+def speech(rng, seconds):
+    """Voiced syllables with gliding pitch and varying formants, grouped into words"""
+    buffer = np.zeros(int(seconds * SAMPLE_RATE))
+    position = 0.0
+    while position < seconds - 0.3:
+        for _ in range(rng.integers(2, 6)):
+            duration = rng.uniform(0.12, 0.3)
+            t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+            pitch = rng.uniform(110, 160) * (1 + 0.1 * np.sin(2 * np.pi * t / duration))
+            phase = np.cumsum(2 * np.pi * pitch / SAMPLE_RATE)
+            formant = rng.uniform(1, 6)
+            syllable = sum(np.sin(k * phase) / k * (1.5 if abs(k - formant) < 1 else 0.5) for k in range(1, 12))
+            place(buffer, 0.3 * syllable * np.sin(np.pi * t / duration) ** 2, position)
+            position += duration + rng.uniform(0.0, 0.08)
+        position += rng.uniform(0.15, 0.5)
+    return buffer
+
+def background(rng, level):
+    return level * rng.standard_normal(WINDOW_SECONDS * SAMPLE_RATE)
+
+class ClassifyWindowTest(unittest.TestCase):
+    """classify_window on synthetic 30 s windows"""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def classify(self, audio):
+        return classify_window(audio.astype(np.float32))
+
+    def test_music_is_labelled_music(self):
+        for make in (band, piano, strings):
+            for level in (1.0, 0.1):
+                with self.subTest(music=make.__name__, level=level):
+                    audio = level * make(self.rng) + background(self.rng, 0.001)
+                    self.assertEqual(self.classify(audio), "music")
+
+    def test_sparse_speech_is_labelled_speech(self):
+        for seconds, level in ((3, 0.001), (5, 0.001), (12, 0.02)):
+            with self.subTest(seconds=seconds, background=level):
+                audio = background(self.rng, level)
+                place(audio, speech(self.rng, seconds), 5.0)
+                self.assertEqual(self.classify(audio), "speech")
+
+    def test_speech_over_music_is_labelled_speech(self):
+        audio = 0.3 * band(self.rng)
+        place(audio, speech(self.rng, 20), 3.0)
+        self.assertEqual(self.classify(audio), "speech")
+
+    def test_noise_and_silence(self):
+        self.assertEqual(self.classify(background(self.rng, 0.02)), "noise")
+        self.assertEqual(self.classify(background(self.rng, 0.001)), "silence")
+
+    def test_frame_features_do_not_depend_on_block_size(self):
+        audio = band(self.rng).astype(np.float32)
+        energy, flatness = frame_features(audio)
+        whole_energy, whole_flatness = frame_features(audio, block_frames=len(audio))
+        np.testing.assert_allclose(energy, whole_energy, rtol=1e-5)
+        np.testing.assert_allclose(flatness, whole_flatness, rtol=1e-4)
+
+@unittest.skipUnless(importlib.util.find_spec("whisper"), "openai-whisper is not installed")
+class NonSpeechSkipTest(unittest.TestCase):
+    """decode_audio skips the decoder on music windows when WHISPER_SKIP_NON_SPEECH is set"""
+
+    def test_music_windows_are_not_decoded(self):
+        from core import transcriber
+
+        rng = np.random.default_rng(1)
+        engine = mock.Mock()
+        engine.transcribe.return_value = {"text": "hello", "language": "en",
+                                          "segments": [{"id": 0, "seek": 0, "start": 0.0, "end": 2.0,
+                                                        "text": "hello", "temperature": 0.0}]}
+        windows = [piano(rng), strings(rng), band(rng), background(rng, 0.001)]
+        speech_window = background(rng, 0.001)
+        place(speech_window, speech(rng, 4), 10.0)
+        windows.append(speech_window)
+
+        before = transcriber.get_decode_stats()
+        with mock.patch.dict(os.environ, {"WHISPER_SKIP_NON_SPEECH": "1", "WHISPER_VAD": "0"}), \
+                mock.patch("core.engines.get_engine", return_value=engine):
+            results = [transcriber.decode_audio(None, audio.astype(np.float32), {"language": "en"}, window=True)[0]
+                       for audio in windows]
+        after = transcriber.get_decode_stats()
+
+        self.assertEqual(engine.transcribe.call_count, 1)
+        self.assertEqual([segment["text"] for segment in results[0]["segments"]], ["(Music)"])
+        self.assertEqual(results[3]["segments"], [])
+        self.assertEqual(after["decode_passes_avoided"] - before["decode_passes_avoided"], 4)
+        self.assertEqual(after["windows_skipped"]["music"] - before["windows_skipped"]["music"], 3)
+        self.assertIn("fallback_decodes_avoided_estimate", after)
+
+if __name__ == '__main__':
+    unittest.main()